@@ -4,12 +4,12 @@
 import os
 import sys
 import csv
-import platform
 
 
 from letters import eprint
 from sd.easy_args import ArgMaster
-from languages import fix_lang, CACHE
+from languages import fix_lang, USER_CACHE
+from storage import atomic_open
 
 
 
@@ -37,12 +37,12 @@ def process_rae():
 		)		
 		sys.exit(1)
 	
-	oname = os.path.join(CACHE, 'rae.txt')
+	oname = os.path.join(USER_CACHE, 'rae.txt')
 	data = dict()
 	eprint("Processing data from", filepath, "to", oname)	
 	
 	
-	with open(oname, 'w', encoding='utf-8') as output:
+	with atomic_open(oname, 'w', encoding='utf-8') as output:
 		with open(filepath, 'r', encoding='utf-8') as file:
 			reader = csv.reader(file, delimiter='\t')
 			next(reader)  # Skip header row
@@ -130,6 +130,22 @@ def parse_args():
 	"Show every word in the dictionary.\n(This will take awhile unless you combine it with --csv)",
 	['skiplines', '', int, 0],
 	"Skip lines at start of words list. (Helpful if you want to resume a session later)",
+	['define', '', str, ''],
+	'''
+	Reverse dictionary: list the most common words with a definition containing all of these English words.
+	For example: --define "deposit" --pos noun
+	The index of definitions is built the first time this is used.''',
+	['pos', '', str, ''],
+	"Only search the definitions of this part of speech with --define, like noun, verb or adjective.",
+	['delta', '', bool, False],
+	'''
+	Only show the words that are new since the last run of the same word list with the same options.
+	The results of every word list are saved in the user cache, so words from earlier runs are never looked up again.
+	With --csv the whole list is still written, with the new words ranked in among the old ones.''',
+	['jobs', '', int, 1],
+	'''
+	Number of processes used to rank long word lists like --wikiwords. 0 = one per CPU.
+	Only used on systems that can fork processes (Linux and macOS), otherwise the list is ranked in one process.''',
 	['dupes', '', str, ''],
 	"Manual input mode: check inputed words against a file and look for duplicates ",
 	['multiline', '', str, 'autodetect'],
@@ -221,9 +237,45 @@ def parse_args():
 	]
 
 
+	resident = [\
+	['daemon', '', bool, False],
+	'''
+	Keep the dictionary loaded in the background and serve lookups to other runs of the program.
+	While it's running, wordtree.py for the same language and frequency list starts instantly.''',
+	['stopdaemon', '', bool, False],
+	"Stop the daemon for the selected language.",
+	['nodaemon', '', bool, False],
+	"Load everything locally even if a daemon is running.",
+	['daemonmanual', '', bool, False],
+	'''
+	Do the lookups of manual mode in the daemon too. Otherwise manual mode loads the dictionary locally.
+	Only word lookups, w and q are supported, without the history or the other manual commands.''',
+	['shared', '', bool, False],
+	'''
+	Memory map the word trees and frequency table instead of loading them.
+	Every process for the same language then shares one copy in memory, which helps when running several lists at once.
+	Lookups are a little slower than with the normal in memory tables.''',
+	]
+
+
+	cache = [\
+	['cacheinfo', '', bool, False],
+	"Show the disk space used by each language and file in the cache folder.",
+	['cachelimit', '', str, ''],
+	'''
+	Keep the cache folder under a size like 2G or 500M.
+	The least recently used languages, book caches and anki copies are deleted until it fits.
+	A deleted language is rebuilt from the Wiktionary dump the next time it's used.''',
+	['compact', '', bool, False],
+	"Run VACUUM on every wiktionary database in the cache folder to reclaim unused space.",
+	]
+
+
 	# debug level 3 will rebuild caches
 	hidden = [\
 	['debug', '', int, 0],
+	['profile-startup', 'profile_startup', str, ''],
+	"Write a json report of the time and memory used by each startup phase to this file. Use - for stdout.",
 	]
 
 	am = ArgMaster(\
@@ -236,6 +288,8 @@ def parse_args():
 	am.update(display, title="\nDisplay options:")
 	am.update(frequencies, title="\nFrequency lists:")
 	am.update(anki, title="\nConnect with Anki")
+	am.update(resident, title="\nSharing between runs:")
+	am.update(cache, title="\nCache management:")
 	am.update(positionals, title="Positional Arguments", positionals=True, hidden=True)
 	am.update(hidden, "Used for testing purposes:", hidden=True)
 	args = am.parse()
@@ -286,6 +340,8 @@ def parse_args():
 	args.ignore = apath(args.ignore)
 	args.dupes = apath(args.dupes)
 	args.csv = apath(args.csv)
+	if args.profile_startup != '-':
+		args.profile_startup = apath(args.profile_startup)
 	os.chdir(sys.path[0])
 
 
@@ -315,6 +371,12 @@ def check_args(args):
 	if not status:
 		return False
 
+	if args.cachelimit:
+		from cachetool import parse_size
+		if parse_size(args.cachelimit) is None:
+			eprint("Can't read --cachelimit", args.cachelimit, "Use a size like 2G or 500M.")
+			return False
+
 	if not args.freq:
 		args.freq = choose_freq(args)
 		eprint("\nUsing frequency file:", args.freq)
@@ -343,7 +405,7 @@ def choose_freq(args):
 	if args.wikifreq:
 		return os.path.join('wikifreq', args.lang[0] + '.xz')
 	elif args.rae:
-		freq = os.path.join(CACHE, 'rae.txt')
+		freq = os.path.join(USER_CACHE, 'rae.txt')
 		if not os.path.exists(freq):
 			process_rae()
 		return freq	
@@ -381,6 +443,8 @@ def guess_anki(path):
 	if path:
 		return path		# user defined location
 
+	import platform
+
 	if platform.system() == 'Windows':
 		path = os.path.join(os.getenv('APPDATA'), 'Anki2')
 	elif platform.system() == 'Linux':
@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+# Prefix completion of words for manual mode.
+# Every title and frequency list word is stored sorted with its hits. Prefixes that match too many words
+# to scan quickly have their most common completions precomputed, so any lookup stays under a millisecond.
+
+import sys
+import heapq
+from array import array
+from bisect import bisect_left
+
+import mapped
+
+
+VERSION = 1			# Increment to rebuild the index after changing the format
+TOP = 10			# Completions stored for each precomputed prefix
+SCAN = 500			# Prefixes matching more words than this are precomputed
+
+
+def build_index(words, freq, filename):
+	'''
+	Write the completion index to filename
+	words = iterable of words to complete
+	freq = dict of word -> hits used to rank them
+	'''
+	words = sorted({word for word in words if word and ' ' not in word and '\n' not in word})
+	hits = array('q', (freq.get(word, 0) for word in words))
+
+	hot = []				# Prefixes with precomputed completions in sorted order
+	top = array('I')		# TOP word indexes for each hot prefix
+
+	def visit(prefix, start, stop):
+		"Walk down the prefix tree until the ranges are small enough to scan"
+		if stop - start <= SCAN:
+			return
+		hot.append(prefix)
+		top.extend(heapq.nlargest(TOP, range(start, stop), key=hits.__getitem__))
+
+		pos = start
+		while pos < stop:
+			if len(words[pos]) <= len(prefix):
+				pos += 1			# The prefix itself sorts before its longer words
+				continue
+			child = words[pos][:len(prefix) + 1]
+			end = bisect_left(words, child + '\U0010ffff', pos, stop)
+			visit(child, pos, end)
+			pos = end
+
+	visit('', 0, len(words))
+	tables = dict(hits=hits, top=top)
+	tables['words.offsets'], tables['words'] = mapped.pack_strings(words)
+	tables['hot.offsets'], tables['hot'] = mapped.pack_strings(hot)
+	mapped.write_tables(filename, tables, version=VERSION)
+
+
+class Completer:
+	"Lookup completions in an index made by build_index"
+
+	def __init__(self, filename):
+		mf = mapped.MappedFile(filename)
+		self.words = mf.strings('words')
+		self.hits = mf.table('hits')
+		self.hot = mf.strings('hot')
+		self.top = mf.table('top')
+
+	def complete(self, prefix, limit=TOP):
+		"Return up to limit words starting with prefix, most common first"
+		index = self.hot.index(prefix) if limit <= TOP and '\n' not in prefix else -1
+		if index >= 0:
+			found = self.top[index * TOP:index * TOP + limit]
+		else:
+			start, stop = self.words.prefix_range(prefix)
+			found = heapq.nlargest(limit, range(start, stop), key=self.hits.__getitem__)
+		return [self.words[pos] for pos in found]
+
+
+if __name__ == "__main__":
+	# Testing: ./autocomplete.py <autocomplete.map> <prefix>
+	print(Completer(sys.argv[1]).complete(sys.argv[2]))
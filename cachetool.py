@@ -0,0 +1,188 @@
+#!/usr/bin/python3
+# Report and limit the disk space used by the cache folder.
+# Language caches are evicted whole, least recently used first, and rebuilt on the next run that needs them.
+
+import os
+import sys
+import time
+import shutil
+
+from languages import CACHE, USER_CACHE
+from letters import eprint
+from manifest import Manifest, file_stamp
+from sd.common import rfs
+from storage import load_json, LAST_USED, TMP_SUFFIX
+
+
+def parse_size(text):
+	"Convert a size like 500M or 2GB to bytes. Returns None if it can't be read."
+	text = text.strip().upper().rstrip('B')
+	mult = 1
+	if text and text[-1] in 'KMGT':
+		mult = 1000 ** ('KMGT'.index(text[-1]) + 1)
+		text = text[:-1]
+	try:
+		size = int(float(text) * mult)
+	except (ValueError, OverflowError):
+		return None
+	return size if size >= 0 else None
+
+
+def folder_size(path):
+	total = 0
+	for root, _, files in os.walk(path):
+		for name in files:
+			filename = os.path.join(root, name)
+			if not os.path.islink(filename):
+				total += os.path.getsize(filename)
+	return total
+
+
+class Item:
+	"A language folder or a single file that can be evicted"
+
+	def __init__(self, path, kind, root):
+		self.path = path
+		self.kind = kind
+		self.name = os.path.relpath(path, root)
+		if root != CACHE:
+			self.name = os.path.join('user', self.name)
+		self.writable = os.access(os.path.dirname(path), os.W_OK)
+		if os.path.isdir(path):
+			self.size = folder_size(path)
+			stamp = os.path.join(path, LAST_USED)
+			if os.path.exists(stamp):
+				self.used = os.path.getmtime(stamp)
+			else:
+				self.used = max([os.path.getmtime(os.path.join(path, name)) for name in os.listdir(path)] or [0])
+		else:
+			self.size = os.path.getsize(path)
+			self.used = os.path.getmtime(path)
+
+	def remove(self):
+		if os.path.isdir(self.path):
+			shutil.rmtree(self.path)
+		else:
+			os.remove(self.path)
+
+
+def find_items():
+	'''
+	List the evictable contents of the shared and user cache folders
+	Small bookkeeping files like usage.json are left alone.
+	'''
+	out = []
+	for root in sorted({CACHE, USER_CACHE}):
+		if not os.path.exists(root):
+			continue
+		for name in sorted(os.listdir(root)):
+			path = os.path.join(root, name)
+			if name == 'freq':
+				out.extend(Item(os.path.join(path, sub), 'frequency cache', root) for sub in sorted(os.listdir(path)))
+			elif os.path.isdir(path):
+				out.append(Item(path, 'language', root))
+			elif name.endswith('.anki2'):
+				out.append(Item(path, 'anki copy', root))
+			elif name.endswith('.json') and name != 'usage.json':
+				out.append(Item(path, 'book cache', root))
+	return out
+
+
+def show_sizes(items):
+	"Print the size of every language and its largest artifacts"
+	total = sum(item.size for item in items)
+	eprint("\nCache folder:", CACHE, "uses", rfs(total))
+	if USER_CACHE != CACHE:
+		eprint("Including the user cache folder:", USER_CACHE, "shown as user/")
+	for item in sorted(items, key=lambda item: item.size, reverse=True):
+		used = time.strftime('%Y-%m-%d', time.localtime(item.used))
+		print(rfs(item.size).rjust(10), item.kind.ljust(16), 'last used', used, ' ', item.name)
+		if item.kind == 'language':
+			for name in sorted(os.listdir(item.path), key=lambda name: -os.path.getsize(os.path.join(item.path, name))):
+				size = os.path.getsize(os.path.join(item.path, name))
+				if size >= item.size / 100:
+					print(' ' * 10, rfs(size).rjust(10), name)
+
+
+def enforce_budget(items, budget):
+	"Delete the least recently used items until the cache fits in budget bytes."
+	total = sum(item.size for item in items)
+	for item in sorted(items, key=lambda item: item.used):
+		if total <= budget:
+			break
+		if not item.writable:
+			continue
+		eprint("Evicting", item.kind, item.name, "to free", rfs(item.size))
+		item.remove()
+		total -= item.size
+	if total > budget:
+		eprint("Cache is still", rfs(total), "which is over the budget of", rfs(budget))
+		return False
+	eprint("Cache is now", rfs(total))
+	return True
+
+
+def restamp(manifest, before, after):
+	"Point the artifacts in manifest that were built from the database stamped before at its new stamp"
+	for name, inputs in manifest.data.items():
+		if isinstance(inputs, dict) and inputs.get('database') == before:
+			inputs['database'] = after
+			manifest.record(name, inputs)
+
+
+def compact(folder):
+	"VACUUM the wiktionary database and keep the manifest in step with the new file"
+	import sqlite3
+	dbname = os.path.join(folder, 'wiktionary.words.db')
+	if not os.path.exists(dbname):
+		return
+	manifest = Manifest(folder)
+	with manifest.lock:
+		manifest.data = load_json(manifest.filename, ok_missing=True)
+		before = file_stamp(dbname)
+		eprint("Compacting:", dbname)
+		con = sqlite3.connect(dbname)
+		con.execute('VACUUM')
+		con.close()
+
+		# Artifacts built from the database are still valid, so point their stamps at the compacted file
+		after = file_stamp(dbname)
+		restamp(manifest, before, after)
+
+		# The definitions index of a cache that was read only is in the user cache with its own manifest
+		user = os.path.join(USER_CACHE, os.path.basename(folder))
+		if os.path.abspath(user) != os.path.abspath(folder) and os.path.exists(os.path.join(user, 'manifest.json')):
+			user_manifest = Manifest(user)
+			if not user_manifest.readonly:
+				with user_manifest.lock:
+					user_manifest.data = load_json(user_manifest.filename, ok_missing=True)
+					restamp(user_manifest, before, after)
+		eprint("\tSaved", rfs(before[0] - after[0]))
+
+		# Left over from builds that were interrupted
+		for name in os.listdir(folder):
+			if name.endswith(TMP_SUFFIX):
+				os.remove(os.path.join(folder, name))
+
+
+def manage(args):
+	"Handle the cache management options"
+	items = find_items()
+	if args.compact:
+		for item in items:
+			if item.kind == 'language' and item.writable:
+				compact(item.path)
+		items = find_items()
+	if args.cachelimit:
+		if not enforce_budget(items, parse_size(args.cachelimit)):
+			return False
+		items = find_items()
+	if args.cacheinfo:
+		show_sizes(items)
+	return True
+
+
+if __name__ == "__main__":
+	# Testing: ./cachetool.py will show the cache sizes
+	show_sizes(find_items())
+	sys.exit(0)
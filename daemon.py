@@ -0,0 +1,354 @@
+#!/usr/bin/python3
+# Resident lookup daemon.
+# wordtree.py --daemon keeps the Tree loaded and serves requests over a Unix domain socket.
+# Every other wordtree.py run for the same language becomes a thin client that skips loading the Tree.
+# Manual mode stays local unless --daemonmanual is given, because the client only has a reduced version of it.
+
+import os
+import io
+import sys
+import json
+import hashlib
+import argparse
+import traceback
+import threading
+from time import perf_counter as tpc
+from contextlib import redirect_stdout, redirect_stderr
+
+from languages import USER_CACHE
+from letters import eprint
+
+# The socket module is only imported once a daemon socket exists, so normal runs don't pay for it.
+
+# Commands that the client can send
+# run		= Process the command line of the client as if the tree was loaded locally
+# lookup	= Show a single word like manual mode
+# entry		= Show the wiktionary entry of a word
+# shutdown	= Stop the daemon
+# The daemon streams the output of a request as lines of {"stdout": text} or {"stderr": text}
+# while it runs and finishes with a line holding the reply with "done" set.
+
+
+def socket_path(langcode):
+	"Location of the socket for a language. Unix sockets have a path limit of about 100 characters."
+	path = os.path.join(USER_CACHE, 'daemon.' + langcode + '.sock')
+	if len(path) >= 100:
+		import tempfile
+		tag = hashlib.sha1(path.encode()).hexdigest()[:12]
+		path = os.path.join(tempfile.gettempdir(), 'wordtree-' + tag + '.sock')
+	return path
+
+
+def send(sock, data):
+	sock.sendall(json.dumps(data).encode() + b'\n')
+
+
+def receive(sock):
+	"Read one json line"
+	with sock.makefile('rb') as f:
+		line = f.readline()
+	return json.loads(line) if line else None
+
+
+def receive_reply(sock):
+	"Print the output chunks as they arrive and return the final reply, or None if the connection was lost"
+	with sock.makefile('rb') as f:
+		for line in f:
+			data = json.loads(line)
+			if 'done' in data:
+				return data
+			for name, text in data.items():
+				stream = sys.stdout if name == 'stdout' else sys.stderr
+				stream.write(text)
+				stream.flush()
+	return None
+
+
+def request(langcode, timeout=None, **req):
+	'''
+	Send a request to the daemon and return the reply or None if it isn't running
+	Any output of the request is printed as it is streamed back.
+	'''
+	path = socket_path(langcode)
+	if not os.path.exists(path):
+		return None
+	import socket
+	try:
+		with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+			sock.settimeout(1)
+			sock.connect(path)
+			sock.settimeout(timeout)
+			send(sock, req)
+			return receive_reply(sock)
+	except (ConnectionError, FileNotFoundError, socket.timeout):
+		return None
+
+
+def show_reply(reply):
+	"Print any output left in the final reply"
+	sys.stderr.write(reply.get('stderr', ''))
+	sys.stdout.write(reply.get('stdout', ''))
+	sys.stdout.flush()
+
+
+class Stream(io.TextIOBase):
+	'''
+	Send everything written to it to the client as {name: text} lines
+	Complete lines are sent in chunks every INTERVAL seconds, or once CHUNK characters have built up,
+	so the client sees the output while the request runs. A client that hung up only loses the rest of the output.
+	'''
+	CHUNK = 64 * 1024
+	INTERVAL = 0.1
+
+	def __init__(self, conn, name, lock):
+		super().__init__()
+		self.conn = conn
+		self.name = name
+		self.lock = lock		# Shared by stdout and stderr so writes from other threads don't mix on the socket
+		self.buffer = []
+		self.size = 0
+		self.sent = tpc()
+		self.lost = False
+		self.other = None		# The stream for the other output, flushed first so the two stay in order
+
+	def writable(self):
+		return True
+
+	def write(self, text):
+		if self.other and self.other.buffer:
+			self.other.flush()
+		self.buffer.append(text)
+		self.size += len(text)
+		if self.size >= self.CHUNK or ('\n' in text and tpc() - self.sent >= self.INTERVAL):
+			self.flush()
+		return len(text)
+
+	def flush(self):
+		if not self.buffer:
+			return
+		text = ''.join(self.buffer)
+		self.buffer = []
+		self.size = 0
+		self.sent = tpc()
+		if self.lost:
+			return
+		try:
+			with self.lock:
+				send(self.conn, {self.name: text})
+		except OSError:
+			self.lost = True
+
+
+class Server:
+	'''
+	Keep the tree loaded and answer requests one at a time.
+	run(args, tree) handles a full command line.
+	load_extras(args) replaces the anki and book paths in args with the loaded data.
+	'''
+
+	def __init__(self, tree, args, run, load_extras):
+		self.tree = tree
+		self.args = args
+		self.run = run
+		self.load_extras = load_extras
+		self.extras = dict()		# Loaded anki and book data by path
+		self.path = socket_path(tree.langcode)
+		self.running = False
+
+		# Preload the anki and book data given on the daemon command line
+		self.make_args(vars(args))
+
+	@staticmethod
+	def extras_key(args):
+		return json.dumps([args.anki, args.decks, args.ankilimit, args.book])
+
+	def make_args(self, client_args):
+		"Rebuild the client's args with anki and book data loaded"
+		args = argparse.Namespace(**client_args)
+		key = self.extras_key(args)
+		if key not in self.extras:
+			self.load_extras(args)
+			self.extras[key] = (args.anki, args.book)
+		args.anki, args.book = self.extras[key]
+		return args
+
+	def check(self, client_args):
+		"Return an error if the client expects a different language or frequency list."
+		if client_args['lang'][0] != self.tree.langcode:
+			return "Daemon is serving a different language: " + self.tree.langcode
+		if os.path.abspath(client_args['freq']) != os.path.abspath(self.args.freq):
+			return "Daemon is using a different frequency list: " + self.args.freq
+		return None
+
+	def lookup(self, args, word):
+		"Show a word like manual mode and return if the root has an entry"
+		from word import Word
+		word = self.tree.check_spelling(word.lower())
+		word = Word(word, self.tree, args)
+		word.print_info(self.tree, args)
+		return dict(word=word.word, root=word.root, entry=bool(self.tree.get_entry(word.root)))
+
+	def entry(self, args, word, root=True):
+		from word import Word
+		Word(word, self.tree, args).print_entry(self.tree, root=root, wikiclean=args.wikiclean)
+
+	def handle(self, req, conn):
+		"Run a single request while streaming its output to conn. Returns the final reply."
+		cmd = req.get('cmd')
+		if cmd == 'shutdown':
+			self.running = False
+			return dict(ok=True, stdout='', stderr="Daemon stopped.\n")
+
+		error = self.check(req['args'])
+		if error:
+			return dict(ok=False, error=error)
+
+		lock = threading.Lock()
+		out, err = Stream(conn, 'stdout', lock), Stream(conn, 'stderr', lock)
+		out.other, err.other = err, out
+		reply = dict(ok=True)
+		with redirect_stdout(out), redirect_stderr(err):
+			try:
+				args = self.make_args(req['args'])
+				if cmd == 'ping':
+					pass
+				elif cmd == 'run':
+					reply['ok'] = bool(self.run(args, self.tree))
+				elif cmd == 'lookup':
+					reply.update(self.lookup(args, req['word']))
+				elif cmd == 'entry':
+					self.entry(args, req['word'], root=req.get('root', True))
+				else:
+					print("Unknown daemon command:", cmd)
+					reply['ok'] = False
+			except SystemExit as e:
+				reply['ok'] = not e.code
+			except Exception:		# pylint: disable=W0718
+				traceback.print_exc()
+				reply['ok'] = False
+		out.flush()
+		err.flush()
+		return reply
+
+	def serve(self):
+		import socket
+		if not hasattr(socket, 'AF_UNIX'):
+			eprint("Daemon mode requires Unix domain sockets which are not available on this system.")
+			return False
+		if request(self.tree.langcode, timeout=5, cmd='ping', args=vars(self.args)) is not None:
+			eprint("A daemon is already running for this language at:", self.path)
+			return False
+		if os.path.exists(self.path):
+			os.remove(self.path)		# Left over from a daemon that crashed
+
+		with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+			sock.bind(self.path)
+			sock.listen()
+			eprint("\nDaemon listening on:", self.path)
+			eprint("Run wordtree.py --stopdaemon --lang", self.tree.langcode, "or press Ctrl-C to stop it.")
+			self.running = True
+			try:
+				while self.running:
+					conn, _ = sock.accept()
+					with conn:
+						try:
+							req = receive(conn)
+							if req:
+								reply = self.handle(req, conn)
+								reply['done'] = True
+								send(conn, reply)
+						except ConnectionError as e:
+							eprint("Lost connection to the client:", e)
+						except ValueError as e:
+							eprint("Bad request:", e)
+			except KeyboardInterrupt:
+				eprint("\nStopping daemon.")
+			finally:
+				os.remove(self.path)
+		return True
+
+
+def connect(args):
+	"Check that the daemon can serve this command line. Returns False if it has to be run locally."
+	reply = request(args.lang[0], cmd='ping', args=vars(args))
+	if not reply:
+		return False
+	if 'error' in reply:
+		eprint(reply['error'], "\nLoading locally instead.")
+		return False
+	eprint("Using the daemon at:", socket_path(args.lang[0]))
+	return True
+
+
+def client(args):
+	'''
+	Forward the command line to the daemon if one is running for this language.
+	Returns the exit status or None if the command must be run locally.
+	'''
+	if args.filename or args.wikiroots or args.wikiwords or args.rankbook or args.define:
+		if not connect(args):
+			return None
+		reply = request(args.lang[0], cmd='run', args=vars(args))
+		if not reply:
+			eprint("Lost connection to the daemon.")
+			return False
+		show_reply(reply)
+		return reply['ok']
+
+	if args.dupes or not args.daemonmanual:
+		return None		# Full manual mode and dupe checking need the tree loaded locally
+	return manual_client(args)
+
+
+def manual_client(args):
+	"Simple version of manual mode that does each lookup in the daemon"
+	from manual import user_word
+
+	if not connect(args):
+		return None
+	eprint("Only word lookups, w and q are supported. Run without --daemonmanual for the full set of manual commands.")
+
+	def show_entry(word, root):
+		request(args.lang[0], cmd='entry', word=word, root=root, args=vars(args))
+
+	word = ''
+	last = ''		# Last word looked up
+	while True:
+		if not word:
+			word = user_word('\nInput word or type q to quit: ')
+		if not word:
+			continue
+		if word == 'q':
+			return True
+		if word == 'w':
+			if last:
+				show_entry(last, False)
+			word = ''
+			continue
+		if ' ' in word:
+			print("Multiple word phrases are not supported.")
+			word = ''
+			continue
+
+		reply = request(args.lang[0], cmd='lookup', word=word, args=vars(args))
+		if not reply:
+			eprint("Lost connection to the daemon.")
+			return False
+		word = ''
+		last = reply.get('word', '')
+		if reply.get('entry') and not args.noentry:
+			i = user_word("\nPress enter to show root entry, type w to show word entry, or type new word: ")
+			if i.lower() == 'w' or not i:
+				show_entry(last, not i)
+			else:
+				word = i
+
+
+def stop(langcode):
+	"Ask the daemon to shut down"
+	reply = request(langcode, cmd='shutdown')
+	if reply is None:
+		eprint("No daemon is running for:", langcode)
+		return False
+	show_reply(reply)
+	return True
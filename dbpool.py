@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+# Read only connections to the wiktionary database.
+# sqlite3 connections can't be shared between threads, so each thread gets its own connection tuned for reading.
+
+import os
+import sys
+import threading
+
+
+MMAP_SIZE = 256 * 1024**2		# Bytes of the database file read through memory-mapped I/O
+CACHE_SIZE = 16 * 1024			# Page cache of each connection in KiB
+
+
+class ReadPool:
+	'''
+	One read only connection per thread, opened on first use.
+	immutable tells sqlite the file can't change while it's open, so it skips file locking entirely.
+	Only use it when nothing can write to the database, like a read only shared cache.
+	'''
+
+	def __init__(self, dbname, immutable=False):
+		self.dbname = os.path.abspath(dbname)
+		self.immutable = immutable
+		self._local = threading.local()
+		self._lock = threading.Lock()
+		self._connections = []
+
+	def uri(self):
+		from urllib.parse import quote
+		path = self.dbname.replace(os.sep, '/')
+		if not path.startswith('/'):
+			path = '/' + path			# Windows drive letters: file:/C:/...
+		return 'file:' + quote(path, safe='/:') + ('?immutable=1' if self.immutable else '?mode=ro')
+
+	def connect(self):
+		import sqlite3
+		con = sqlite3.connect(self.uri(), uri=True, check_same_thread=False)
+		con.execute('PRAGMA query_only = ON')
+		con.execute('PRAGMA mmap_size = ' + str(MMAP_SIZE))
+		con.execute('PRAGMA cache_size = ' + str(-CACHE_SIZE))
+		con.execute('PRAGMA temp_store = MEMORY')
+		return con
+
+	def cursor(self):
+		"Cursor for the calling thread"
+		cur = getattr(self._local, 'cursor', None)
+		if cur is None:
+			con = self.connect()
+			with self._lock:
+				self._connections.append(con)
+			cur = self._local.cursor = con.cursor()
+		return cur
+
+	def close(self):
+		"Close the connections of every thread"
+		with self._lock:
+			for con in self._connections:
+				con.close()
+			self._connections = []
+		self._local = threading.local()
+
+
+if __name__ == "__main__":
+	# Testing: ./dbpool.py <database> <word>
+	pool = ReadPool(sys.argv[1])
+	print(pool.uri())
+	print(pool.cursor().execute('select entry from words where word=?', (sys.argv[2],)).fetchone())
@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+# Reverse dictionary: find words by searching the text of their definitions.
+# Every definition line in the wiktionary database is cleaned and stored in an sqlite FTS5 index,
+# so a search like "deposit" returns the matching words in milliseconds. The matches are then ranked by frequency.
+
+import os
+import sys
+
+from dbpool import ReadPool
+from storage import atomic_path
+from letters import eprint
+from wikitext import definition_lines
+
+
+VERSION = 1			# Increment to rebuild the index after changing the format
+LIMIT = 50			# Matches shown by a search
+BATCH = 10000		# Definitions inserted per query while building
+
+
+def have_fts5():
+	"Some sqlite builds are compiled without full-text search"
+	import sqlite3
+	try:
+		sqlite3.connect(':memory:').execute('create virtual table test using fts5(text)')
+	except sqlite3.OperationalError:
+		return False
+	return True
+
+
+def build_index(dbname, filename):
+	"Write the definitions of every entry in the wiktionary database to an FTS5 index in filename"
+	import sqlite3
+	src = ReadPool(dbname)
+	with atomic_path(filename) as tmp:
+		con = sqlite3.connect(tmp)
+		con.execute("create virtual table defs using fts5(word unindexed, pos unindexed, definition, "
+					"tokenize='unicode61 remove_diacritics 2')")
+
+		rows = []
+		for word, entry in src.cursor().execute('select word, entry from words'):
+			for pos, line in definition_lines(entry):
+				rows.append((word, pos, line))
+			if len(rows) >= BATCH:
+				con.executemany('insert into defs values (?, ?, ?)', rows)
+				rows = []
+		con.executemany('insert into defs values (?, ?, ?)', rows)
+		con.execute("insert into defs(defs) values('optimize')")
+		con.commit()
+		con.close()
+		src.close()
+
+
+def fts_query(text):
+	"Quote each search term so punctuation can't be read as FTS5 syntax. Every term must match."
+	return ' '.join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+
+class Definitions:
+	"Search an index made by build_index"
+
+	def __init__(self, filename):
+		self.db = ReadPool(filename)
+
+	def search(self, text, pos=''):
+		'''
+		Return a dict of word -> (pos, definition) for every word with a definition containing all the terms in text.
+		pos limits the search to one part of speech, like noun or verb.
+		'''
+		query = 'select word, pos, definition from defs where defs match ?'
+		params = [fts_query(text)]
+		if pos:
+			query += ' and lower(pos) = ?'
+			params.append(pos.lower())
+		found = dict()
+		if params[0]:
+			for word, heading, definition in self.db.cursor().execute(query + ' order by rowid', params):
+				found.setdefault(word, (heading, definition))		# First matching definition of each word
+		return found
+
+
+def show_search(tree, text, pos='', limit=LIMIT):
+	"Print the most common words with a definition matching text"
+	found = tree.search_definitions(text, pos)
+	if not found:
+		print("No definitions found for:", text)
+		return False
+	ranked = sorted(found, key=lambda word: (-tree.get_fpm(word), word))
+	print("\nFound", len(ranked), "words with definitions matching:", text, "\n")
+	for word in ranked[:limit]:
+		heading, definition = found[word]
+		print(f"{tree.get_fpm(word):>10.2f} fpm  {word:<20} {heading:<12} {definition}")
+	if len(ranked) > limit:
+		print("... and", len(ranked) - limit, "less common words")
+	return True
+
+
+if __name__ == "__main__":
+	# Testing: ./definitions.py <definitions.db> <search terms>
+	for key, value in Definitions(sys.argv[1]).search(' '.join(sys.argv[2:])).items():
+		print(key, value)
+	eprint("FTS5 available:", have_fts5())
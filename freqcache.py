@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+# Preparsed binary copies of the frequency lists.
+# Decompressing and splitting a .xz list takes a second or two, loading the mapped copy is near instant.
+
+import os
+import sys
+import hashlib
+from array import array
+from itertools import accumulate
+
+import mapped
+from languages import CACHE, USER_CACHE
+from letters import eprint
+from storage import open_any, file_hash
+
+
+VERSION = 1			# Increment to rebuild every frequency cache after changing the format
+
+
+def cache_name(filename, folder=CACHE):
+	"Location of the cached copy of a frequency list"
+	path = os.path.abspath(filename)
+	tag = hashlib.sha1(path.encode()).hexdigest()[:8]
+	return os.path.join(folder, 'freq', os.path.basename(filename) + '.' + tag + '.map')
+
+
+def read_freq_file(filename):
+	"Scan through frequency list and return dict of word->hits and a list of the hits on every line"
+	counts = []			# The raw hits at each word line
+	freq_table = dict()
+	with open_any(filename) as f:
+		for line in f:
+			line = line.strip().split()
+			if len(line) >= 2:
+				word = line[0]
+				if word.startswith('#'):
+					continue
+				try:
+					count = int(line[1].replace(',', ''))
+				except (ValueError, IndexError) as e:
+					eprint("Invalid line!", line, '\n', e)
+					continue
+				freq_table[word] = count
+				counts.append(count)
+	return freq_table, counts
+
+
+def build_cache(filename, cname, stamp):
+	"Parse the frequency list and write the mapped copy"
+	freq_table, counts = read_freq_file(filename)
+
+	# Sort counts Top to bottom and sum them up
+	# Doing it this way allows for non sorted frequency files
+	counts.sort(reverse=True)
+	sums = array('q', accumulate(counts))		# The sum of hits in the table at each word line
+	counts.reverse()							# Ascending for bisect_left
+
+	words = sorted(freq_table)
+	offsets, data = mapped.pack_strings(words)
+	tables = {'words': data,
+			  'words.offsets': offsets,
+			  'counts': array('q', [freq_table[word] for word in words]),
+			  'sorted': array('q', counts),
+			  'sums': sums,
+			  }
+
+	os.makedirs(os.path.dirname(cname), exist_ok=True)
+	mapped.write_tables(cname, tables, total=sums[-1] if sums else 0, **stamp)
+
+
+class FreqCache:
+	'''
+	Mapped copy of a frequency list with:
+		words	= sorted words in the table
+		counts	= hits of each word (aligned with words)
+		sorted	= hits of every line sorted from lowest to highest
+		sums	= cumulative sum of hits from highest to lowest
+	'''
+
+	def __init__(self, filename):
+		cname = cache_name(filename)
+		stat = os.stat(filename)
+		stamp = dict(version=VERSION, size=stat.st_size, mtime=stat.st_mtime_ns)
+
+		mf = mapped.MappedFile(cname) if os.path.exists(cname) else None
+		if USER_CACHE != CACHE and not (mf and all(mf.header.get(key) == val for key, val in stamp.items())):
+			# The shared cache is read only so keep a private copy
+			cname = cache_name(filename, USER_CACHE)
+			mf = mapped.MappedFile(cname) if os.path.exists(cname) else None
+		if mf and any(mf.header.get(key) != val for key, val in stamp.items()):
+			# Touched but maybe not changed, like after a git checkout
+			stamp['sha1'] = file_hash(filename)
+			if mf.header['version'] == VERSION and mf.header.get('sha1') == stamp['sha1']:
+				mapped.write_tables(cname, mf.copy_tables(), total=mf.header['total'], **stamp)
+				mf = mapped.MappedFile(cname)
+			else:
+				mf = None
+
+		if not mf:
+			stamp.setdefault('sha1', file_hash(filename))
+			build_cache(filename, cname, stamp)
+			mf = mapped.MappedFile(cname)
+
+		self.filename = filename
+		self.header = mf.header
+		self.total = mf.header['total']
+		self.words = mf.strings('words')
+		self.counts = mf.table('counts')
+		self.sorted = mf.table('sorted')
+		self.sums = mf.table('sums')
+
+	def table(self):
+		"Return dict of word->hits"
+		return dict(zip(self.words.tolist(), self.counts))
+
+	def __len__(self):
+		return len(self.words)
+
+	def get(self, word, default=0):
+		"Lookup the hits of a single word without loading the table"
+		index = self.words.index(word)
+		return self.counts[index] if index >= 0 else default
+
+
+if __name__ == "__main__":
+	# Testing: ./freqcache.py <frequency file>
+	fc = FreqCache(sys.argv[1])
+	print(fc.header)
+	print(len(fc.words), 'words', fc.total, 'hits')
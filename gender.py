@@ -11,7 +11,7 @@ import sys
 import sqlite3
 from time import perf_counter as tpc
 
-from languages import CACHE
+from languages import language_cache
 from sd.common import undent
 from sd.common import rns, percent
 from sd.easy_args import easy_parse
@@ -142,7 +142,7 @@ def tag_gender(tag):
 
 def loader(lang):
 	"Load words and entries into memory."
-	dbname = os.path.join(CACHE, lang, 'wiktionary.words.db')
+	dbname = os.path.join(language_cache(lang), 'wiktionary.words.db')
 	freq_file = os.path.join('freq', lang + '.xz')
 
 	if not all(map(os.path.exists, (dbname, freq_file))):
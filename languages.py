@@ -4,9 +4,40 @@ import os
 import sys
 from letters import eprint
 
-CACHE = os.path.join(os.path.abspath(os.path.dirname(sys.argv[0])), 'cache')
+def writable(folder):
+	"Check if files can be created in folder or in the nearest parent that exists"
+	while not os.path.exists(folder):
+		parent = os.path.dirname(folder)
+		if parent == folder:
+			return False
+		folder = parent
+	return os.access(folder, os.W_OK)
 
-eprint("Using cache folder:", CACHE)
+
+def user_cache():
+	"Per user folder for files that change on every run, used when the shared cache is read only"
+	if os.environ.get('WORDTREE_USER_CACHE'):
+		return os.path.abspath(os.environ['WORDTREE_USER_CACHE'])
+	if writable(CACHE):
+		return CACHE
+	base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+	if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+		base = os.environ['LOCALAPPDATA']
+	return os.path.join(base, 'wordtree')
+
+
+# Language caches are read from CACHE, which can be a read only folder shared by every user.
+# Usage stats, book caches and anki copies are always written to USER_CACHE.
+CACHE = os.path.abspath(os.environ.get('WORDTREE_CACHE') or os.path.join(os.path.dirname(sys.argv[0]), 'cache'))
+USER_CACHE = user_cache()
+
+
+def language_cache(langcode):
+	"Use the shared cache for a language if it has been built there or can be, otherwise build it in the user cache."
+	shared = os.path.join(CACHE, langcode)
+	if any(os.path.exists(os.path.join(shared, name)) for name in ('manifest.json', 'meta.json')) or writable(shared):
+		return shared
+	return os.path.join(USER_CACHE, langcode)
 
 LANGCODES = {'ar': 'Arabic', 'bg': 'Bulgarian', 'bn': 'Bengali', 'br': 'Breton', 'ca': 'Catalan', 'cs': 'Czech', 'da': 'Danish', 'de': 'German', 'el': 'Greek', 'en': 'English', 'eo': 'Esperanto', 'es': 'Spanish', 'et': 'Estonian', 'eu': 'Basque', 'fa': 'Persian', 'fi': 'Finnish', 'fr': 'French', 'gl': 'Galician', 'he': 'Hebrew', 'hi': 'Hindi', 'hu': 'Hungarian', 'hy': 'Armenian', 'id': 'Indonesian', 'it': 'Italian', 'ja': 'Japanese', 'ka': 'Georgian', 'kk': 'Kazakh', 'ko': 'Korean', 'lv': 'Latvian', 'mk': 'Macedonian', 'ml': 'Malayalam', 'nl': 'Dutch', 'no': 'Norwegian', 'pl': 'Polish', 'pt': 'Portuguese', 'pt-br': 'Brazilian', 'ro': 'Romanian', 'ru': 'Russian', 'sh': 'Serbo-Croatian', 'si': 'Sinhalese', 'sk': 'Slovak', 'sl': 'Slovene', 'sq': 'Albanian', 'sv': 'Swedish', 'ta': 'Tamil', 'te': 'Telugu', 'th': 'Thai', 'tl': 'Tagalog', 'tr': 'Turkish', 'uk': 'Ukrainian', 'ur': 'Urdu', 'vi': 'Vietnamese', 'zh': 'Chinese', 'pt-br' : 'Brazilian', 'zh-tw': 'Taiwanese'} # pylint: disable=line-too-long
 
@@ -3,12 +3,17 @@
 import sys
 import string
 
-try:
-	from unidecode import unidecode
-except ModuleNotFoundError:
-	print("Could not load unidecode module. Spelling correction will be limited.")
-	print("\tTo install unidecode, please run: python3 -m pip install unidecode")
-	print("\tand then delete spelling.json inside the cache folder.\n\n")
+
+def load_unidecode():
+	"Import unidecode when it's needed instead of on every run. Returns None if it's not installed."
+	try:
+		from unidecode import unidecode
+	except ModuleNotFoundError:
+		eprint("Could not load unidecode module. Spelling correction will be limited.")
+		eprint("\tTo install unidecode, please run: python3 -m pip install unidecode")
+		eprint("\tThe spelling table will be rebuilt automatically once it is installed.\n\n")
+		return None
+	return unidecode
 
 
 # Punctuation table
@@ -28,10 +33,16 @@ def strip_punct(word):
 	return word.strip().translate(PUNCT)
 
 
+def fold(word):
+	"Lowercase a word and strip the accents from common letters"
+	return word.lower().translate(FOLD)
+
+
 def make_unidecode(src, verbose=False):
 	"Make unidecode backup of common letters"
 
 	common = src.strip().replace(' ', '').replace('-', '')
+	unidecode = load_unidecode()
 
 	translations = dict()
 	for letter in common:
@@ -43,32 +54,40 @@ def make_unidecode(src, verbose=False):
 		eprint('TRANSLATIONS =', translations, "# pylint: disable = line-too-long")
 
 
+def fold_letters(text):
+	'''
+	Dict of letter -> the letter without accents for every letter found in text
+	unidecode is called once per letter instead of once per word. Without it only the common letters in TRANSLATIONS are folded.
+	'''
+	letters = dict(TRANSLATIONS)
+	decode = load_unidecode()
+	if not decode:
+		eprint("Attempting spelling corrections with limited table.")
+		return letters
+	for letter in set(text):
+		if ord(letter) > 127:
+			basic = decode(letter)
+			if basic != letter and '\n' not in basic:
+				letters[letter] = basic
+	return letters
+
+
 def make_spellings(words):
-	"Make a dict of all words without accents"
-	miss = dict()			# dict of misspelled words -> accented orignal
-
-	def simple_decode(word):
-		out = list()
-		for c in word:
-			if c in TRANSLATIONS:
-				out += TRANSLATIONS[c]
-			else:
-				out += c
-		return ''.join(out)
-
-	if 'unidecode' not in sys.modules:
-		print("Attempting spelling corrections with limited table.")
-		decode = simple_decode
-	else:
-		decode = unidecode
-
-	for word in words:
-		basic = decode(word)
+	'''
+	Make a dict of folded word -> every word that folds to it
+	Only accents are folded, not capitals, so a lowercase word is never corrected to a capitalized title.
+	Words that are already folded are left out. The whole list is translated in one go,
+	which is much faster than folding the words one at a time.
+	Returns the dict and the letters it was folded with, which a lookup has to fold its word with too.
+	'''
+	text = '\n'.join(words)
+	letters = fold_letters(text)
+	folded = text.translate(str.maketrans(letters)).split('\n')
+	miss = dict()
+	for word, basic in zip(words, folded):
 		if basic != word:
-			if basic not in miss:
-				miss[basic] = []
-			miss[basic].append(word)
-	return miss
+			miss.setdefault(basic, []).append(word)
+	return miss, letters
 
 
 
@@ -88,6 +107,7 @@ COMMON_SYMBOLS = "á é í ó ú - ã ñ õ - à è ì ò ù - ä ë ï ö ü ÿ
 # Translations is included explicity in case the user can't run unidecode
 # Run ./letters.py to regenerate
 TRANSLATIONS = {'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u', 'ã': 'a', 'ñ': 'n', 'õ': 'o', 'à': 'a', 'è': 'e', 'ì': 'i', 'ò': 'o', 'ù': 'u', 'ä': 'a', 'ë': 'e', 'ï': 'i', 'ö': 'o', 'ü': 'u', 'ÿ': 'y', 'â': 'a', 'ê': 'e', 'î': 'i', 'ô': 'o', 'û': 'u', 'č': 'c', 'š': 's', 'ž': 'z', 'ą': 'a', 'ę': 'e', 'ł': 'l', 'ż': 'z', 'å': 'a', 'æ': 'ae', 'ç': 'c', 'œ': 'oe', 'ı': 'i', 'ø': 'o', 'ß': 'ss', 'ů': 'u', 'ā': 'a', 'ē': 'e', 'ī': 'i', 'ō': 'o', 'ū': 'u', 'į': 'i', 'ų': 'u', 'þ': 'th', 'İ': 'I', 'ð': 'd'} # pylint: disable = line-too-long
+FOLD = str.maketrans(TRANSLATIONS)
 
 
 
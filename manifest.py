@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+# Track the inputs that every cached artifact was built from.
+# An artifact is rebuilt when any of its inputs change instead of relying on --debug 3 to rebuild everything.
+
+import os
+import sys
+import importlib.util
+
+from letters import eprint
+from storage import load_json, dump_json, FileLock
+
+
+def file_stamp(path):
+	"Size and modification time of a file or None if it's missing"
+	if not os.path.exists(path):
+		return None
+	stat = os.stat(path)
+	return [stat.st_size, stat.st_mtime_ns]
+
+
+def have_module(name):
+	"Check if a module is installed without importing it"
+	return importlib.util.find_spec(name) is not None
+
+
+class Manifest:
+	'''
+	manifest.json inside each language folder
+	Stores artifact name -> dict of inputs used to build it.
+	'''
+
+	def __init__(self, folder, rebuild=False):
+		self.folder = folder
+		self.filename = os.path.join(folder, 'manifest.json')
+		self.rebuild = rebuild			# Treat every artifact as stale
+		self.data = load_json(self.filename, ok_missing=True)
+		self.lock = FileLock(os.path.join(folder, 'build.lock'))
+		self.locked = False
+		self.readonly = not os.access(folder, os.W_OK)		# Shared cache that only an admin can rebuild
+
+	def _fresh(self, name, inputs, outputs):
+		if self.rebuild or self.data.get(name) != inputs:
+			return False
+		return all(map(os.path.exists, outputs))
+
+	def fresh(self, name, inputs, *outputs):
+		'''
+		Return True if the artifact was built from the same inputs and all of its output files exist.
+		The first stale artifact takes the build lock, which is held until unlock() so only one process builds at a time.
+		A process that had to wait rereads the manifest to pick up what the other one built.
+		'''
+		if self._fresh(name, inputs, outputs):
+			return True
+		if self.readonly:
+			return self._use_readonly(name, inputs, outputs)
+		if not self.locked:
+			self.lock.acquire("\nWaiting for another process to finish building the cache in: " + self.folder)
+			self.locked = True
+			self.data = load_json(self.filename, ok_missing=True)
+			return self._fresh(name, inputs, outputs)
+		return False
+
+	def _use_readonly(self, name, inputs, outputs):
+		"A stale artifact in a read only cache is still better than nothing if it exists."
+		if name in self.data and all(map(os.path.exists, outputs)):
+			eprint("Using", name, "from the read only cache although these inputs changed:", ', '.join(self.changed(name, inputs)))
+			return True
+		eprint("\nError:", name, "is missing from the read only cache in:", self.folder)
+		eprint("Run wordtree.py once as a user who can write there, or set WORDTREE_CACHE to a different folder.")
+		sys.exit(1)
+
+	def unlock(self):
+		if self.locked:
+			self.lock.release()
+			self.locked = False
+
+	def changed(self, name, inputs):
+		"List the inputs that differ from the last build for a status message"
+		old = self.data.get(name) or dict()
+		return sorted(key for key in set(old) | set(inputs) if old.get(key) != inputs.get(key))
+
+	def record(self, name, inputs):
+		self.data[name] = inputs
+		if not self.readonly:
+			dump_json(self.filename, self.data)
+
+	def forget(self, name):
+		if self.data.pop(name, None) is not None:
+			dump_json(self.filename, self.data)
+
+	def __contains__(self, name):
+		return name in self.data
+
+
+if __name__ == "__main__":
+	# Testing: ./manifest.py <language cache folder>
+	for key, val in Manifest(sys.argv[1]).data.items():
+		eprint(key, val)
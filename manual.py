@@ -54,11 +54,35 @@ class ManualInput:
 			words = []
 		self.words = words
 		self.count = 0
+		self.memo = dict()		# Results of earlier lookups, so showing the history is quick
+		self.matches = []		# Current tab completions
+		self.setup_completion()
+
+	def setup_completion(self):
+		"Tab completion of words with readline, which isn't available on Windows"
+		if not sys.stdin.isatty():
+			return
+		try:
+			import readline
+		except ModuleNotFoundError:
+			return
+		readline.set_completer_delims(' \t\n')
+		readline.set_completer(self.complete)
+		if 'libedit' in (readline.__doc__ or ''):
+			readline.parse_and_bind('bind ^I rl_complete')		# macOS
+		else:
+			readline.parse_and_bind('tab: complete')
+
+	def complete(self, text, state):
+		"Readline completer returning the most common words starting with text"
+		if state == 0:
+			self.matches = self.tree.complete(text) if text else []
+		return self.matches[state] if state < len(self.matches) else None
 
 	def show_word(self, word, **kargs):
 		"Lookup word and check against dupe count (if available)"
 		dupes = 1
-		word = Word(word, self.tree, self.args)
+		word = Word(word, self.tree, self.args, memo=self.memo)
 		root = word.root
 		if root in self.words:
 			word.dupes = self.words[root].dupes + 1
@@ -102,7 +126,7 @@ class ManualInput:
 	def process_cmd(self, word):
 		split = word.split()
 		cmd = split[0] if word else ''
-		if self.repeating(word) or cmd in 'fd':
+		if self.repeating(word) or cmd in ('f', 'd', 'r'):
 			if cmd == 'q':
 				self.print_history()
 				sys.exit(0)
@@ -131,6 +155,14 @@ class ManualInput:
 				print("Loading:", freq_table)
 				self.tree.load_table(freq_table, extended=True)
 
+			elif cmd == 'r':
+				text = word[1:].strip()
+				if text:
+					import definitions
+					definitions.show_search(self.tree, text, self.args.pos)
+				else:
+					print("Type r followed by the words to search for in the definitions.")
+
 			elif cmd.startswith('h'):
 				self.show_history(len(word))
 
@@ -0,0 +1,241 @@
+#!/usr/bin/python3
+# Read only, memory-mapped tables used by the cache folder.
+# Each file is a small json header followed by raw arrays, so loading is just an mmap call
+# and every process reading the same file shares the same pages in memory.
+
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+
+from storage import atomic_open
+
+
+MAGIC = b'WTMAP1\n'
+ALIGN = 8
+
+
+def pack_strings(words):
+	'''
+	Pack a sorted list of strings into a newline joined blob and an array of offsets.
+	Word i is found at blob[offsets[i]:offsets[i+1] - 1]
+	'''
+	data = '\n'.join(words).encode()
+	offsets = array('Q', [0])
+	offsets.extend(accumulate(len(word.encode()) + 1 for word in words))
+	return offsets, data
+
+
+def pack_dict(data, name, chunk=0):
+	'''
+	Pack a dict of word -> list of strings into tables for MappedDict.
+	chunk will flatten lists of tuples with that many items each.
+	'''
+	keys = sorted(data)
+	values = []
+	starts = array('Q', [0])
+	for key in keys:
+		items = data[key]
+		for item in items:
+			if chunk:
+				values.extend(item)
+			else:
+				values.append(item)
+		starts.append(len(values))
+
+	tables = dict()
+	tables[name + '.offsets'], tables[name] = pack_strings(keys)
+	tables[name + '.values.offsets'], tables[name + '.values'] = pack_strings(values)
+	tables[name + '.starts'] = starts
+	return tables
+
+
+def write_tables(filename, tables, **header):
+	'''
+	Write a dict of name -> array or bytes to filename.
+	Extra keyword arguments are stored in the json header.
+	'''
+	index = dict()
+	offset = 0
+	for name, data in tables.items():
+		typecode = _typecode(data)
+		size = len(data) * getattr(data, 'itemsize', 1)
+		index[name] = (typecode, offset, size)
+		offset += size + (-size % ALIGN)
+	header['tables'] = index
+
+	head = json.dumps(header).encode()
+	head += b' ' * (-(len(MAGIC) + 8 + len(head)) % ALIGN)
+
+	with atomic_open(filename, 'wb') as f:
+		f.write(MAGIC)
+		f.write(struct.pack('<Q', len(head)))
+		f.write(head)
+		for name, data in tables.items():
+			data = bytes(data) if isinstance(data, (bytes, bytearray)) else data.tobytes()
+			f.write(data)
+			f.write(b'\0' * (-len(data) % ALIGN))
+
+
+def _typecode(data):
+	"Array typecode of data. Plain bytes are stored as 'B'"
+	if isinstance(data, array):
+		return data.typecode
+	if isinstance(data, memoryview):
+		return data.format
+	return 'B'
+
+
+class MappedFile:
+	"Memory map a file written by write_tables"
+
+	def __init__(self, filename):
+		with open(filename, 'rb') as f:
+			self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		if self._map[:len(MAGIC)] != MAGIC:
+			raise ValueError("Not a mapped table file: " + filename)
+		size = struct.unpack('<Q', self._map[len(MAGIC):len(MAGIC) + 8])[0]
+		start = len(MAGIC) + 8
+		self.header = json.loads(self._map[start:start + size])
+		self._base = start + size
+
+	def table(self, name):
+		"Return a zero copy view of the table cast to its original type"
+		typecode, offset, size = self.header['tables'][name]
+		start = self._base + offset
+		view = memoryview(self._map)[start:start + size]
+		return view if typecode == 'B' else view.cast(typecode)
+
+	def strings(self, name):
+		"Return a MappedStrings object for tables written with pack_strings"
+		typecode, offset, size = self.header['tables'][name]
+		return MappedStrings(self.table(name + '.offsets'), self._map, self._base + offset, size)
+
+	def copy_tables(self):
+		"Return an in memory copy of every table, suitable for write_tables"
+		out = dict()
+		for name, (typecode, _, _) in self.header['tables'].items():
+			data = array(typecode)
+			data.frombytes(self.table(name).tobytes())
+			out[name] = data
+		return out
+
+
+class MappedStrings:
+	'''
+	Sorted list of strings in a memory map.
+	Lookups are done with a binary search on the utf-8 bytes,
+	which sort in the same order as python strings.
+	'''
+
+	def __init__(self, offsets, blob, start, size):
+		self._offsets = offsets
+		self._blob = blob
+		self._start = start
+		self._size = size
+
+	def __len__(self):
+		return len(self._offsets) - 1
+
+	def __getitem__(self, index):
+		return self._raw(index).decode()
+
+	def _raw(self, index):
+		if index < 0:
+			index += len(self)
+		start = self._start + self._offsets[index]
+		return self._blob[start:self._start + self._offsets[index + 1] - 1]
+
+	def index(self, word, default=-1):
+		"Return the position of word or default if missing"
+		key = word.encode()
+		raw = _RawView(self)
+		pos = bisect_left(raw, key)
+		if pos < len(self) and raw[pos] == key:
+			return pos
+		return default
+
+	def __contains__(self, word):
+		if '\n' in word:
+			return False
+		return self.index(word) >= 0
+
+	def prefix_range(self, prefix):
+		"Return the (start, stop) indexes of all words beginning with prefix"
+		key = prefix.encode()
+		raw = _RawView(self)
+		start = bisect_left(raw, key)
+		stop = bisect_left(raw, key + b'\xff', lo=start)
+		return start, stop
+
+	def __iter__(self):
+		return iter(self.tolist())
+
+	def tolist(self):
+		"Decode every word at once. Much faster than iterating one word at a time."
+		if not len(self):
+			return []
+		return self._blob[self._start:self._start + self._size].decode().split('\n')
+
+
+class MappedDict:
+	'''
+	Read only dict of word -> list stored with pack_dict.
+	Values are rebuilt on each lookup, so callers are free to modify them.
+	'''
+
+	def __init__(self, mf, name, chunk=0):
+		self._keys = mf.strings(name)
+		self._values = mf.strings(name + '.values')
+		self._starts = mf.table(name + '.starts')
+		self._chunk = chunk
+
+	def __len__(self):
+		return len(self._keys)
+
+	def __contains__(self, key):
+		return key in self._keys
+
+	def __iter__(self):
+		return iter(self._keys)
+
+	def keys(self):
+		return self._keys.tolist()
+
+	def _items_at(self, index):
+		values = [self._values[pos] for pos in range(self._starts[index], self._starts[index + 1])]
+		if self._chunk:
+			return list(zip(*[iter(values)] * self._chunk))
+		return values
+
+	def get(self, key, default=None):
+		index = self._keys.index(key) if '\n' not in key else -1
+		return default if index < 0 else self._items_at(index)
+
+	def __getitem__(self, key):
+		value = self.get(key)
+		if value is None:
+			raise KeyError(key)
+		return value
+
+
+class _RawView:
+	"Expose the raw bytes of MappedStrings to bisect"
+
+	def __init__(self, strings):
+		self._strings = strings
+
+	def __len__(self):
+		return len(self._strings)
+
+	def __getitem__(self, index):
+		return self._strings._raw(index)
+
+
+if __name__ == "__main__":
+	# Testing: ./mapped.py <filename> will show the header of a mapped file
+	print(json.dumps(MappedFile(sys.argv[1]).header, indent=4))
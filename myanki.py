@@ -11,7 +11,7 @@ import zipfile
 import hashlib
 import platform
 
-from languages import CACHE
+from languages import USER_CACHE
 
 def eprint(*args, **kargs):
 	args = list(args)
@@ -82,7 +82,7 @@ def getnotes(filename):
 
 	if ext == '.apkg':
 		try:
-			tmp = zipfile.ZipFile(filename).extract('collection.anki21', CACHE)
+			tmp = zipfile.ZipFile(filename).extract('collection.anki21', USER_CACHE)
 		except KeyError:
 			eprint("Try using the option to 'Support older versions of Anki' when exporting")
 			sys.exit(1)
@@ -90,9 +90,9 @@ def getnotes(filename):
 		os.remove(tmp)
 	else:
 		# Read cards and/or make/read a cached copy of database
-		os.makedirs(CACHE, exist_ok=True)
+		os.makedirs(USER_CACHE, exist_ok=True)
 		cached = sanitize(os.path.abspath(filename)) + ext
-		cached = os.path.join(CACHE, cached)
+		cached = os.path.join(USER_CACHE, cached)
 		notes, cards, decks = read_database(filename, retries=0)
 
 		if notes:
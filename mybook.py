@@ -4,7 +4,7 @@ import os
 import sys
 from time import perf_counter as tpc
 
-from languages import CACHE
+from languages import USER_CACHE
 from tree import make_freq_table
 from sd.common import rns, percent
 from letters import strip_punct, eprint
@@ -135,5 +135,19 @@ def load_book(filename):
 		return freq
 	
 	eprint("Loading:", filename)
-	book = make_or_load_json(os.path.join(CACHE, os.path.basename(filename) + '.json'), get_freq_table, filename)	
+	book = make_or_load_json(os.path.join(USER_CACHE, os.path.basename(filename) + '.json'), get_freq_table, filename)	
 	return book	
+
+
+_book_keys = dict()		# id of a loaded book -> (book, digest). Holding the book keeps its id from being reused.
+
+
+def book_key(book):
+	"Digest of a loaded book's counts that stays the same for as long as the book is used"
+	if not book:
+		return None
+	if id(book) not in _book_keys:
+		import json
+		import hashlib
+		_book_keys[id(book)] = (book, hashlib.sha1(json.dumps(sorted(book.items())).encode()).hexdigest())
+	return _book_keys[id(book)][1]
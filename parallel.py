@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+# Rank long word lists with several processes.
+# The list is cut into chunks that forked workers run through find_dupes with their copy-on-write view of the tree.
+# Merging the chunks in order gives the same words and dupe counts as one process would.
+
+import os
+
+from letters import eprint
+
+# multiprocessing is only imported when a list is long enough to split up
+
+
+MIN_WORDS = 10000		# Shorter lists finish before the workers would start
+CHUNKS = 4				# Chunks per worker, so a slow chunk doesn't hold up the others
+
+_work = None			# (words, tree, args, find_dupes, memo) inherited by the forked workers
+
+
+def job_count(jobs):
+	"Number of worker processes for --jobs. 0 means one per CPU."
+	return jobs if jobs > 0 else os.cpu_count() or 1
+
+
+def can_fork():
+	"Sharing the loaded tree needs fork. Starting fresh processes would mean loading the tree again in each one."
+	import multiprocessing
+	return 'fork' in multiprocessing.get_all_start_methods()
+
+
+def _chunk(bounds):
+	words, tree, args, find_dupes, memo = _work
+	start, stop = bounds
+	return list(find_dupes(words[start:stop], tree, args, jobs=1, quiet=True, memo=memo).values())
+
+
+def find_dupes(words, tree, args, jobs, func, memo):
+	'''
+	Run func (wordtree.find_dupes) on chunks of words in jobs processes and merge the results
+	The first chunk with a root keeps its Word and the later chunks add their dupes to it.
+	Each worker starts with a copy of memo. What the workers add to it stays in the workers.
+	'''
+	global _work		# pylint: disable=W0603
+	import multiprocessing
+	size = -(-len(words) // (jobs * CHUNKS))
+	bounds = [(start, min(start + size, len(words))) for start in range(0, len(words), size)]
+	eprint("\nCalculating the frequency and root of", len(words), "words with", jobs, "processes")
+
+	_work = (list(words), tree, args, func, memo)		# --wikiwords passes the mapped titles which can't be sliced
+	try:
+		with multiprocessing.get_context('fork').Pool(jobs) as pool:
+			results = pool.map(_chunk, bounds, chunksize=1)
+	finally:
+		_work = None
+
+	unranked = dict()
+	for chunk in results:
+		for word in chunk:
+			if word.root in unranked:
+				unranked[word.root].dupes += word.dupes
+			else:
+				unranked[word.root] = word
+	return unranked
@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+# Record wall time, cpu time and peak memory of each startup phase.
+# Enabled with: wordtree.py --profile-startup report.json
+
+import os
+import sys
+import json
+import time
+from contextlib import contextmanager
+from time import perf_counter as tpc
+
+from letters import eprint
+
+try:
+	import resource
+except ModuleNotFoundError:
+	resource = None			# Windows
+
+
+PHASES = []			# List of finished phases in order
+ENABLED = False
+START = 0			# Wall time when profiling started
+
+
+def enable():
+	"Start recording phases. Tracemalloc slows down allocation, so wall times will be a little high."
+	global ENABLED, START
+	import tracemalloc
+	ENABLED = True
+	START = tpc()
+	tracemalloc.start()
+
+
+def max_rss():
+	"Peak resident memory of the process in MB or None if unavailable"
+	if not resource:
+		return None
+	rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# Linux reports KB and MacOS reports bytes
+	return round(rss / (1024**2 if sys.platform == 'darwin' else 1024), 1)
+
+
+@contextmanager
+def phase(name):
+	"Time the code inside a with block as one phase"
+	if not ENABLED:
+		yield
+		return
+
+	import tracemalloc
+	tracemalloc.reset_peak()
+	base = tracemalloc.get_traced_memory()[0]
+	wall = tpc()
+	cpu = time.process_time()
+	try:
+		yield
+	finally:
+		current, peak = tracemalloc.get_traced_memory()
+		PHASES.append(dict(name=name,
+						   wall=round(tpc() - wall, 4),
+						   cpu=round(time.process_time() - cpu, 4),
+						   python_peak_mb=round((peak - base) / 1024**2, 2),
+						   python_kept_mb=round((current - base) / 1024**2, 2),
+						   max_rss_mb=max_rss(),
+						   ))
+
+
+def report(filename, **info):
+	"Write the phases to a json file. Use - for stdout"
+	if not ENABLED:
+		return None
+	import platform
+	import tracemalloc
+	out = dict(info)
+	out['python'] = platform.python_version()
+	out['platform'] = platform.platform()
+	out['created'] = int(time.time())
+	out['phases'] = PHASES
+	out['total'] = dict(wall=round(tpc() - START, 4),
+						cpu=round(time.process_time(), 4),
+						python_mb=round(tracemalloc.get_traced_memory()[0] / 1024**2, 2),
+						max_rss_mb=max_rss(),
+						)
+	text = json.dumps(out, indent=4)
+	if filename == '-':
+		print(text)
+	else:
+		with open(filename, 'w') as f:
+			f.write(text + '\n')
+		eprint("Wrote startup profile to:", os.path.abspath(filename))
+	return out
@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+# Saved results of word list runs.
+# The root, fpm, derived fpm and book count of the words in each list file are kept in the user cache,
+# so running the same growing list again only looks up the words that were added since.
+
+import os
+import json
+import hashlib
+
+from languages import USER_CACHE
+from letters import eprint
+from manifest import file_stamp
+from mybook import book_key
+from storage import dump_json, load_json, file_hash
+from word import Word
+
+
+VERSION = 1			# Increment to discard saved results after changing how words are calculated
+
+
+def usable(args):
+	"Only word list files are saved. --wikiroots has its own root table and the others are too large to be worth it."
+	return bool(args.filename) and not (args.wikiroots or args.wikiwords or args.rankbook)
+
+
+class ResultCache:
+	'''
+	Word -> (fpm, root, derived, book_count) for one combination of word list file,
+	language, word tree, frequency file, book and the options that change the results.
+	Each list has its own results, so --delta only hides the words from earlier runs of that list.
+	'''
+
+	def __init__(self, tree, args):
+		key = dict(list=os.path.abspath(args.filename),
+				   lang=tree.langcode, freq=file_hash(tree.freq_file), book=book_key(args.book),
+				   tree=file_stamp(os.path.join(tree.cache, 'tree.json')),
+				   reverse=file_stamp(os.path.join(tree.cache, 'reverse.json')),
+				   stars=args.stars, starval=args.starval, showall=args.showall, version=VERSION)
+		digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+		folder = os.path.join(USER_CACHE, tree.langcode)
+		os.makedirs(folder, exist_ok=True)
+		self.filename = os.path.join(folder, 'results.' + digest + '.json')
+		self.data = load_json(self.filename, ok_missing=True)
+
+	def __contains__(self, word):
+		return word in self.data
+
+	def roots(self):
+		"Roots of every saved word"
+		return {values[1] for values in self.data.values()}
+
+	def make_memo(self, tree, args):
+		"A memo for Word with every saved word already filled in"
+		return {Word.memo_key(word, tree, args): tuple(values) for word, values in self.data.items()}
+
+	def update(self, memo, ranked):
+		'''
+		Save the results of a run
+		memo = the memo used by find_dupes
+		ranked = the ResultSet of rank_list, which has the results of words looked up by other processes with --jobs
+		'''
+		before = len(self.data)
+		for key, values in memo.items():
+			if key[1] is None:			# Branch lookups aren't saved
+				self.data.setdefault(key[0], list(values))
+		for row, word in enumerate(ranked.words):
+			if word not in self.data:
+				self.data[word] = [ranked.fpm[row], ranked.roots[row], ranked.derived[row], ranked.book_count[row]]
+		if len(self.data) != before:
+			dump_json(self.filename, self.data)
+			eprint("Saved the results of", len(self.data) - before, "new words to:", self.filename)
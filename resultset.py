@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+# Columnar results of rank_list.
+# A ranked list of a few hundred thousand roots held as Word objects costs an object per word.
+# ResultSet keeps the same numbers as parallel columns and only makes a Word when one is asked for.
+
+from array import array
+
+from word import Word
+
+
+class ResultSet:
+	'''
+	Words and their results stored column by column in rank order
+	Iterating or indexing gives Word objects like the list rank_list used to return.
+	'''
+
+	def __init__(self, words=()):
+		self.words = []
+		self.roots = []
+		self.fpm = array('d')
+		self.derived = array('d')
+		self.book_fpm = array('d')
+		self.book_count = []			# Kept as given, a book read as a frequency table can have fractional counts
+		self.dupes = array('I')
+		self.score = array('d')			# Sort value of each word
+		self.extra = dict()				# index -> extra columns, only for the words that have them
+		for word in words:
+			self.append(word)
+
+	def append(self, word, score=0):
+		if word.extra:
+			self.extra[len(self.words)] = word.extra
+		self.words.append(word.word)
+		self.roots.append(word.root)
+		self.fpm.append(word.fpm)
+		self.derived.append(word.derived)
+		self.book_fpm.append(word.book_fpm)
+		self.book_count.append(word.book_count)
+		self.dupes.append(word.dupes)
+		self.score.append(score)
+
+	def take(self, rows):
+		"New ResultSet with the given rows in that order"
+		out = ResultSet()
+		rows = list(rows)
+		for name in ('words', 'roots', 'fpm', 'derived', 'book_fpm', 'book_count', 'dupes', 'score'):
+			column = getattr(self, name)
+			values = [column[row] for row in rows]
+			setattr(out, name, values if isinstance(column, list) else array(column.typecode, values))
+		out.extra = {index: self.extra[row] for index, row in enumerate(rows) if row in self.extra}
+		return out
+
+	def __len__(self):
+		return len(self.words)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [self[row] for row in range(*index.indices(len(self)))]
+		if index < 0:
+			index += len(self)
+		return Word.restore(self.words[index], self.roots[index], self.fpm[index], self.derived[index],
+							dupes=self.dupes[index], book_fpm=self.book_fpm[index], book_count=self.book_count[index],
+							extra=self.extra.get(index, ()))
+
+	def __iter__(self):
+		for index in range(len(self)):
+			yield self[index]
@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+# Materialized table of every root in the word tree with its derived fpm.
+# --wikiroots has to add up the conjugations of every root before --min and --max throw most of them away.
+# The first run saves the totals sorted by fpm, so later runs find any fpm range with a binary search
+# and only make Word objects for the roots inside it.
+
+import os
+import hashlib
+from array import array
+from bisect import bisect_left, bisect_right
+
+import mapped
+from letters import eprint
+from manifest import file_stamp
+from sd.common import rns
+from word import Word
+
+
+VERSION = 1			# Increment to rebuild the tables after changing the format
+
+
+def table_name(freq_file):
+	"Each frequency file gets its own table"
+	return 'roots.' + hashlib.sha1(os.path.abspath(freq_file).encode()).hexdigest()[:12] + '.map'
+
+
+def usable(args):
+	"The table holds the dupes of the plain word tree without a book, so those options need the full calculation"
+	return args.wikiroots and not args.book and not args.ignore
+
+
+def write_table(unranked, filename):
+	'''
+	Write the result of find_dupes to filename sorted by derived fpm
+	order is the position of each word in find_dupes, so ties are ranked the same way as before.
+	'''
+	rows = sorted(enumerate(unranked.values()), key=lambda row: (row[1].derived, row[0]))
+	tables = dict(
+		derived=array('d', (word.derived for _, word in rows)),
+		fpm=array('d', (word.fpm for _, word in rows)),
+		dupes=array('I', (word.dupes for _, word in rows)),
+		order=array('I', (index for index, _ in rows)),
+		)
+	tables['words.offsets'], tables['words'] = mapped.pack_strings([word.word for _, word in rows])
+	tables['roots.offsets'], tables['roots'] = mapped.pack_strings([word.root for _, word in rows])
+	mapped.write_tables(filename, tables, version=VERSION)
+
+
+class RootTable:
+	"Range queries on a table made by write_table"
+
+	def __init__(self, filename):
+		mf = mapped.MappedFile(filename)
+		self.derived = mf.table('derived')
+		self.fpm = mf.table('fpm')
+		self.dupes = mf.table('dupes')
+		self.order = mf.table('order')
+		self.words = mf.strings('words')
+		self.roots = mf.strings('roots')
+
+	def __len__(self):
+		return len(self.derived)
+
+	def between(self, low=0, high=0):
+		"Range of rows with derived fpm from low to high, same as the --min and --max checks in Word.skipped"
+		start = bisect_left(self.derived, low) if low else 0
+		stop = bisect_right(self.derived, high) if high else len(self.derived)
+		return range(start, max(start, stop))
+
+	def top(self, count):
+		"Range of the count rows with the highest derived fpm, most common last"
+		return range(max(0, len(self.derived) - count), len(self.derived))
+
+	def make_words(self, rows):
+		"Word objects for the rows in their find_dupes order without looking anything up"
+		out = dict()
+		for row in sorted(rows, key=self.order.__getitem__):
+			root = self.roots[row]
+			out[root] = Word.restore(self.words[row], root, self.fpm[row], self.derived[row], dupes=self.dupes[row])
+		return out
+
+
+def find_dupes(tree, args, build):
+	'''
+	find_dupes for every root in the word tree, limited to --min and --max
+	build = function that runs the full find_dupes when the table is missing or out of date
+	'''
+	folder, manifest = tree.optional_cache()
+	name = table_name(tree.freq_file)
+	filename = os.path.join(folder, name)
+	inputs = dict(tree=file_stamp(os.path.join(tree.cache, 'tree.json')),
+				  reverse=file_stamp(os.path.join(tree.cache, 'reverse.json')),
+				  freq=[os.path.abspath(tree.freq_file)] + file_stamp(tree.freq_file),
+				  stars=args.stars, starval=args.starval, version=VERSION)
+	if not manifest.fresh(name, inputs, filename):
+		unranked = build()
+		write_table(unranked, filename)
+		manifest.record(name, inputs)
+		manifest.unlock()
+		return unranked
+	manifest.unlock()
+
+	table = RootTable(filename)
+	rows = table.between(args.min, args.max)
+	eprint("\nRead", rns(len(rows)), "of", rns(len(table)), "roots from the root table:", filename)
+	return table.make_words(rows)
@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+# Batch scoring for rank_list.
+# Instead of filtering and scoring each Word on its own, the numbers of the whole list are gathered into columns
+# and scored together. numpy does the math when it's installed and the list is long enough to pay for the arrays.
+
+import heapq
+from itertools import islice
+from operator import itemgetter
+
+from word import log_weighted_avg
+
+
+NUMPY_MIN = 1000		# Shorter lists are faster in plain Python
+TIE = 1e-12				# Relative difference below which numpy rounding could reorder two scores
+
+
+def load_numpy():
+	"Import numpy when a long list is scored. Returns None if it's not installed."
+	try:
+		import numpy
+	except ModuleNotFoundError:
+		return None
+	return numpy
+
+
+def log_weighted_avgs(np, a, b, factor):
+	"log_weighted_avg on arrays a and b with the same operations in the same order"
+	if factor < 0:
+		factor = abs(factor)
+		a, b = b, a
+	linear = (a * factor + b) / (factor + 1)
+	with np.errstate(divide='ignore', invalid='ignore'):
+		logs = 1e6 * 10**((np.log10(a / 1e6) * factor + np.log10(b / 1e6)) / (factor + 1))
+	return np.where((a <= 0) | (b <= 0), linear, logs)
+
+
+def select(words, args, np=None):
+	"Drop the words that Word.skipped would skip"
+	if np is None and len(words) >= NUMPY_MIN:
+		np = load_numpy()
+	if not np:
+		return [word for word in words if not word.skipped(args)]
+
+	derived = np.array([word.derived for word in words], dtype=float)
+	keep = np.ones(len(words), dtype=bool)
+	if args.max:
+		keep &= derived <= args.max
+	if args.min:
+		keep &= derived >= args.min
+	words = [word for word, ok in zip(words, keep.tolist()) if ok]
+	if args.skipanki:
+		words = [word for word in words if not word.check_anki(args.anki)]
+	return words
+
+
+def score(word, args):
+	"Sort value of a single word: calc_adj averaged with the word's own fpm by --sortfactor"
+	fpm = word.calc_adj(args)
+	if word.fpm:
+		# example: a factor of 10 means the original fpm is weighted 1/10 toward the word fpm
+		return log_weighted_avg(word.fpm, fpm, args.sortfactor / 100)
+	return fpm
+
+
+def scores(words, args, np=None):
+	'''
+	Return the sort value of every word, the same as calling score on each one
+	The numpy version computes the book adjustment, dupe adjustment and sortfactor average for all the words at once.
+	np = numpy module to use, False for plain Python or None to choose by the length of the list
+	'''
+	if np is None and len(words) >= NUMPY_MIN:
+		np = load_numpy()
+	if not np:
+		return [score(word, args) for word in words]
+
+	fpm = np.array([word.fpm for word in words], dtype=float)
+	derived = np.array([word.derived for word in words], dtype=float)
+	book_fpm = np.array([word.book_fpm for word in words], dtype=float)
+	dupes = np.array([word.dupes for word in words], dtype=float)
+
+	# Word.calc_adj
+	adj = np.where(book_fpm != 0, log_weighted_avgs(np, book_fpm, derived, args.bookfactor / 100), derived)
+	boosted = np.where(adj <= 0.01, 0.01, adj)		# little boost to help words with 0 fpm and many dupes
+	adj = np.where(dupes > 1, log_weighted_avgs(np, boosted * dupes, boosted, args.dupefactor / 100), adj)
+
+	# Sortfactor
+	values = np.where(fpm != 0, log_weighted_avgs(np, fpm, adj, args.sortfactor / 100), adj)
+	return exact_ties(np, values, words, args)
+
+
+def exact_ties(np, values, words, args):
+	'''
+	numpy's log10 and power can differ from the math module in the last bit.
+	That only changes the ranking for scores within a hair of each other or of a histogram bin edge,
+	so those few are recomputed in Python to make the output identical to scoring one word at a time.
+	'''
+	order = np.argsort(values, kind='stable')
+	ordered = values[order]
+	near = np.abs(np.diff(ordered)) <= TIE * np.abs(ordered[1:])
+	close = np.zeros(len(values), dtype=bool)
+	close[order[1:][near]] = True
+	close[order[:-1][near]] = True
+	with np.errstate(divide='ignore', invalid='ignore'):
+		logs = np.log10(values)
+		close |= (values > 0) & (np.abs(logs - np.round(logs)) <= TIE)		# The bins are powers of 10
+
+	out = values.tolist()
+	for index in np.flatnonzero(close).tolist():
+		out[index] = score(words[index], args)
+	return out
+
+
+def window(scored, start=0, stop=None, reverse=False, key=itemgetter(0)):
+	'''
+	Yield the [:stop][start:] slice of (score, word) pairs in rank order, the same as sorting them all and slicing
+	With a stop only the best stop pairs are kept in a heap, so scored can be a generator of any length
+	without the whole list being held or sorted. Ties keep their input order just like a stable sort.
+	A negative start or stop counts from the end, which needs the whole sorted list.
+	key = sort value of an item, for ranking something other than pairs such as row numbers
+	'''
+	if start < 0 or (stop is not None and stop < 0):
+		yield from sorted(scored, key=key, reverse=not reverse)[:stop][start:]
+		return
+	if stop is not None:
+		best = (heapq.nsmallest if reverse else heapq.nlargest)(stop, scored, key=key)
+	else:
+		best = sorted(scored, key=key, reverse=not reverse)
+	yield from islice(best, start, None)
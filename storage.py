@@ -3,10 +3,9 @@
 import os
 import csv
 import sys
-import bz2
-import lzma
-import gzip
+import hashlib
 import itertools
+from contextlib import contextmanager
 
 from languages import CACHE
 from time import perf_counter as tpc
@@ -43,12 +42,16 @@ def open_any(filename):
 	if not os.path.exists(filename):
 		raise ValueError("Filename does exist: " + filename)
 		
+	# Compression modules are imported on demand because cached frequency tables don't need them
 	ext = os.path.splitext(filename.lower())[-1]
 	if ext == '.bz2':
+		import bz2
 		return bz2.open(filename, 'rt')
 	elif ext == '.xz':
+		import lzma
 		return lzma.open(filename, 'rt')
 	elif ext == '.gz':
+		import gzip
 		return gzip.open(filename, 'rt')
 	elif ext == '.txt':
 		return open(filename, 'rt')
@@ -77,8 +80,7 @@ def make_or_load_json(filename, function, *args):
 	if not os.path.exists(filename):
 		# print("Making", filename + '...')
 		data = function(*args)
-		with open(filename, 'w') as out:
-			json.dump(data, out)
+		dump_json(filename, data)
 	else:
 		if os.path.getsize(filename) >= 1e6:
 			start = loading(filename)
@@ -89,9 +91,126 @@ def make_or_load_json(filename, function, *args):
 	return data
 
 
+def file_hash(filename):
+	"Sha1 of a file's contents"
+	sha = hashlib.sha1()
+	with open(filename, 'rb') as f:
+		for chunk in iter(lambda: f.read(1024**2), b''):
+			sha.update(chunk)
+	return sha.hexdigest()
+
+
+LAST_USED = 'last_used'		# Touched by every run that loads a language cache
+
+
+def touch(folder):
+	"Mark a language cache as recently used for --cachelimit"
+	path = os.path.join(folder, LAST_USED)
+	with open(path, 'a'):
+		os.utime(path)
+
+
+TMP_SUFFIX = '.tmp'		# Files left with it by an interrupted build are removed by --compact
+
+
+def tmp_name(filename):
+	"Temporary name to build filename under. Unique so processes building the same file don't collide."
+	return filename + '.' + str(os.getpid()) + TMP_SUFFIX
+
+
+@contextmanager
+def atomic_path(filename):
+	'''
+	Yield a temporary path to build filename at, for writers like sqlite that need a path instead of a file object
+	It is renamed over filename when the block finishes and removed if it fails.
+	'''
+	tmp = tmp_name(filename)
+	if os.path.exists(tmp):
+		os.remove(tmp)
+	try:
+		yield tmp
+		os.replace(tmp, filename)
+	finally:
+		if os.path.exists(tmp):
+			os.remove(tmp)
+
+
+@contextmanager
+def atomic_open(filename, mode='w', **kargs):
+	'''
+	Write to a temporary file and rename it over filename when done.
+	Other processes see either the old file or the complete new one, never a partial write.
+	'''
+	with atomic_path(filename) as tmp:
+		with open(tmp, mode, **kargs) as f:
+			yield f
+
+
+def _lock_file(f, wait):
+	"Lock an open file with flock or msvcrt on Windows. Returns False if wait is off and it's already locked."
+	try:
+		import fcntl
+	except ModuleNotFoundError:
+		import msvcrt
+		f.seek(0)
+		while True:
+			try:
+				msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if wait else msvcrt.LK_NBLCK, 1)
+				return True
+			except OSError:
+				if not wait:
+					return False
+				# LK_LOCK gives up after 10 seconds so keep trying
+	try:
+		fcntl.flock(f, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+		return True
+	except BlockingIOError:
+		return False
+
+
+def _unlock_file(f):
+	try:
+		import fcntl
+	except ModuleNotFoundError:
+		import msvcrt
+		f.seek(0)
+		msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+	else:
+		fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class FileLock:
+	"Exclusive lock shared between processes. The lock is freed by the OS if the holder crashes."
+
+	def __init__(self, filename):
+		self.filename = filename
+		self._file = None
+
+	def acquire(self, message=''):
+		"Wait for the lock, printing message if another process is holding it"
+		self._file = open(self.filename, 'a+')
+		if not _lock_file(self._file, wait=False):
+			if message:
+				eprint(message)
+			_lock_file(self._file, wait=True)
+
+	def release(self):
+		if self._file:
+			_unlock_file(self._file)
+			self._file.close()
+			self._file = None
+
+	def __enter__(self):
+		self.acquire()
+		return self
+
+	def __exit__(self, *args):
+		self.release()
+
+
 def dump_roots(filename, dct):
 	"Convert dict to csv"
-	with open(filename, 'w') as csv_file:
+	with atomic_open(filename) as csv_file:
 		writer = csv.writer(csv_file, lineterminator='\n')
 		writer.writerows([i[0]] + [y for x in i[1] for y in x] for i in dct.items())
 
@@ -108,7 +227,7 @@ def load_roots(filename):
 
 
 def dump_json(filename, data):
-	with open(filename, 'w') as f:
+	with atomic_open(filename) as f:
 		json.dump(data, f)
 
 
@@ -127,7 +246,7 @@ def dump_csv(filename, dct, chain=False, printme=False):
 	Convert dict to csv
 	chain will mash together nested lists
 	'''
-	with open(filename, 'w') as csv_file:
+	with atomic_open(filename) as csv_file:
 		writer = csv.writer(csv_file, lineterminator='\n')
 		for key, val in dct.items():
 			if chain:
@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+# Typo correction with a SymSpell style index of deletions.
+# Each title is stored under every string made by deleting up to MAX_DISTANCE letters from it,
+# so a typo only has to look up its own deletions instead of being compared against every title.
+
+import sys
+import zlib
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+
+import mapped
+from letters import fold
+
+
+VERSION = 2			# Increment to rebuild the index after changing the format
+MAX_DISTANCE = 2	# Largest edit distance of a suggestion
+PREFIX = 7			# Only the start of each word is indexed, which keeps the index small. Later typos are caught by the distance check.
+CHUNK = 1 << 20		# Entries sorted at a time by build_index
+
+
+def deletes(word):
+	"The start of a word and every string made by deleting up to MAX_DISTANCE letters from it"
+	word = word[:PREFIX]
+	out = {word}
+	last = out
+	for _ in range(MAX_DISTANCE):
+		last = {text[:pos] + text[pos + 1:] for text in last for pos in range(len(text))}
+		out |= last
+	return out
+
+
+def crc(text):
+	"Index key of a deletion. Collisions are fine because every candidate is checked with distance()"
+	return zlib.crc32(text.encode())
+
+
+def distance(a, b, limit=MAX_DISTANCE):
+	"Edit distance counting swapped neighbours as one edit. Returns limit + 1 once it's over the limit."
+	if abs(len(a) - len(b)) > limit:
+		return limit + 1
+	prev2 = None
+	prev = list(range(len(b) + 1))
+	for i, ca in enumerate(a, 1):
+		row = [i] + [0] * len(b)
+		for j, cb in enumerate(b, 1):
+			row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (ca != cb))
+			if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+				row[j] = min(row[j], prev2[j - 2] + 1)
+		if min(row) > limit:
+			return limit + 1
+		prev2, prev = prev, row
+	return prev[-1]
+
+
+def build_index(words, filename):
+	'''
+	Write the deletion index of a list of titles to filename
+	Stored as two aligned tables sorted by key: the crc of each deletion and the index of its title.
+	The entries are sorted in chunks and merged, so only one chunk is ever held as Python ints.
+	'''
+	chunks = []
+	entries = array('Q')
+	for index, word in enumerate(words):
+		if ' ' in word:
+			continue				# Manual mode only looks up single words
+		for text in deletes(fold(word)):
+			entries.append(crc(text) << 32 | index)
+		if len(entries) >= CHUNK:
+			chunks.append(array('Q', sorted(entries)))
+			entries = array('Q')
+	chunks.append(array('Q', sorted(entries)))
+	del entries
+
+	keys = array('I')
+	ids = array('I')
+	for entry in heapq.merge(*chunks):
+		keys.append(entry >> 32)
+		ids.append(entry & 0xffffffff)
+	mapped.write_tables(filename, dict(keys=keys, ids=ids), version=VERSION)
+
+
+class SymSpell:
+	"Lookup words in an index made by build_index"
+
+	def __init__(self, filename, words):
+		mf = mapped.MappedFile(filename)
+		self.keys = mf.table('keys')
+		self.ids = mf.table('ids')
+		self.words = words			# The same titles the index was built from
+
+	def lookup(self, word):
+		"Return a list of (distance, title) for every title within MAX_DISTANCE edits"
+		folded = fold(word)
+		seen = set()
+		for text in deletes(folded):
+			key = crc(text)
+			start = bisect_left(self.keys, key)
+			seen.update(self.ids[start:bisect_right(self.keys, key, lo=start)])
+
+		out = []
+		for index in seen:
+			title = self.words[index]
+			dist = distance(folded, fold(title))
+			if dist <= MAX_DISTANCE:
+				out.append((dist, title))
+		return out
+
+
+if __name__ == "__main__":
+	# Testing: ./symspell.py <titles.map> <symspell.map> <word>
+	titles = mapped.MappedFile(sys.argv[1]).strings('words')
+	print(sorted(SymSpell(sys.argv[2], titles).lookup(sys.argv[3])))
@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+# Benchmarks for tracking performance regressions between versions.
+# Usage: ./benchmark.py imports [module]
+#        ./benchmark.py dupes [language code] [runs]
+#        ./benchmark.py scores [language code] [runs]
+#        ./benchmark.py memory [language code]
+
+import os
+import sys
+import subprocess
+from time import perf_counter as tpc
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be imported by the code paths that use them
+LAZY_MODULES = ['sqlite3', 'urllib.request', 'xml.etree.ElementTree', 'gzip', 'wikitext', 'myanki', 'manual',
+				'unidecode', 'tracemalloc', 'platform', 'zipfile', 'numpy', 'multiprocessing']
+
+
+def import_times(module):
+	"Run python -X importtime and return a list of (cumulative us, self us, module name)"
+	cmd = [sys.executable, '-X', 'importtime', '-c', 'import ' + module]
+	proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True, check=True)
+	out = []
+	for line in proc.stderr.splitlines():
+		if not line.startswith('import time:') or 'self [us]' in line:
+			continue
+		own, cumulative, name = line.split(':', 1)[1].split('|')
+		out.append((int(cumulative), int(own), name.rstrip()))
+	return out
+
+
+def bench_imports(module='wordtree', runs=5, top=15):
+	"Show the import time of module and the slowest modules it pulls in"
+	results = [import_times(module) for _ in range(runs)]
+	totals = sorted(next(cum for cum, _, name in times if name.strip() == module) for times in results)
+	print("Import time of", module, "over", runs, "runs:")
+	print("\tbest:", round(totals[0] / 1000, 1), "ms  median:", round(totals[len(totals) // 2] / 1000, 1), "ms")
+
+	print("\nSlowest imports (cumulative ms, self ms, module):")
+	for cumulative, own, name in sorted(results[0], reverse=True)[:top]:
+		print('\t' + str(round(cumulative / 1000, 1)).ljust(8), str(round(own / 1000, 1)).ljust(8), name)
+
+	loaded = {name.strip() for _, _, name in results[0]}
+	eager = [name for name in LAZY_MODULES if name in loaded]
+	print("\nModules that should be lazy but were imported:", ', '.join(eager) if eager else 'none')
+	return not eager
+
+
+def load_tree(*options):
+	"Load the program as if it was run with options and return its args and tree"
+	sys.argv = [os.path.join(ROOT, 'wordtree.py'), '--nodaemon'] + list(options)
+	sys.path.insert(0, ROOT)
+	from args import parse_args
+	from tree import Tree
+	args = parse_args()
+	return args, Tree(args.freq, args.lang)
+
+
+def bench_dupes(lang='es', runs=3):
+	"Words per second of find_dupes on every root in the word tree like --wikiroots"
+	args, tree = load_tree('--lang', lang, '--wikiroots')
+	from wordtree import find_dupes
+	words = list(tree.word_tree.keys())
+	times = []
+	for _ in range(int(runs)):
+		start = tpc()
+		find_dupes(words, tree, args)
+		times.append(tpc() - start)
+	times.sort()
+	print("\nfind_dupes on", len(words), "roots over", runs, "runs:")
+	print("\tbest:", int(len(words) / times[0]), "words/sec  median:", int(len(words) / times[len(times) // 2]), "words/sec")
+	return True
+
+
+def bench_scores(lang='es', runs=3):
+	"Time rank_list scoring of every root with and without numpy and check that both give the same ranking"
+	args, tree = load_tree('--lang', lang, '--wikiroots')
+	import scoring
+	from wordtree import find_dupes
+	words = list(find_dupes(list(tree.word_tree.keys()), tree, args).values())
+	results = dict()
+	for name, np in (('python', False), ('numpy', scoring.load_numpy())):
+		if np is None:
+			print("\nnumpy is not installed, only timing the python version.")
+			continue
+		times = []
+		for _ in range(int(runs)):
+			start = tpc()
+			selected = scoring.select(words, args, np=np)
+			values = scoring.scores(selected, args, np=np)
+			times.append(tpc() - start)
+		results[name] = sorted(zip(values, (word.word for word in selected)), reverse=True)
+		print("\nScoring", len(words), "roots with", name + ":", "best:", round(min(times) * 1000, 1), "ms")
+
+	if len(results) == 2:
+		same = [word for _, word in results['python']] == [word for _, word in results['numpy']]
+		diff = max(abs(a[0] - b[0]) / (abs(a[0]) or 1) for a, b in zip(results['python'], results['numpy']))
+		print("Same ranking:", same, " Largest relative difference in score:", diff)
+		return same
+	return True
+
+
+class DictWord:
+	"A Word laid out the way it was before __slots__, with a __dict__ for its attributes"
+
+
+def allocated(make):
+	"Bytes still allocated by the object that make returns"
+	import tracemalloc
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	obj = make()
+	size = tracemalloc.get_traced_memory()[0] - before
+	tracemalloc.stop()
+	del obj
+	return size
+
+
+def bench_memory(lang='es'):
+	"Memory used to hold the ranked results of every root as Word objects with a __dict__, with __slots__ and as a ResultSet"
+	args, tree = load_tree('--lang', lang, '--wikiroots')
+	from resultset import ResultSet
+	from word import Word
+	from wordtree import find_dupes
+	words = list(find_dupes(list(tree.word_tree.keys()), tree, args).values())
+
+	def dict_words():
+		out = []
+		for word in words:
+			copy = DictWord()
+			for name in Word.__slots__:
+				setattr(copy, name, getattr(word, name))
+			copy.extra = list(word.extra)		# Word.restore copies it too
+			out.append(copy)
+		return out
+
+	def slot_words():
+		return [Word.restore(word.word, word.root, word.fpm, word.derived, word.dupes, word.book_fpm, word.book_count, word.extra)
+				for word in words]
+
+	print("\nMemory used by the results of", len(words), "roots:")
+	for name, make in (('Word with __dict__', dict_words), ('Word with __slots__', slot_words), ('ResultSet', lambda: ResultSet(words))):
+		size = allocated(make)
+		print('\t' + name.ljust(22), str(round(size / 1024)).rjust(8), "KiB ", round(size / len(words)), "bytes/word")
+	return True
+
+
+def main():
+	cmd = sys.argv[1] if len(sys.argv) > 1 else 'imports'
+	if cmd == 'imports':
+		return bench_imports(*sys.argv[2:3])
+	if cmd == 'dupes':
+		return bench_dupes(*sys.argv[2:4])
+	if cmd == 'scores':
+		return bench_scores(*sys.argv[2:4])
+	if cmd == 'memory':
+		return bench_memory(*sys.argv[2:3])
+	print("Unknown benchmark:", cmd)
+	return False
+
+
+if __name__ == "__main__":
+	sys.exit(not main())
@@ -16,6 +16,13 @@ title "Simple manual mode test. This will take awhile if you haven't built these
 echo -e "hello\nq\n" | ../wordtree.py --lang engli
 
 
+title "A lowercase word that is also a capitalized title should be kept as typed"
+if echo -e "españa\nq\n" | ../wordtree.py --lang spanish --noentry 2>&1 | grep "Correcting word: españa"; then
+	echo "Error: españa was corrected to the title España"
+	exit 1
+fi
+
+
 title "Reading The Jungle Book"
 ../wordtree.py --anki --lang eng --rankbook The_Jungle_Book.txt --csv out.csv
 
@@ -3,32 +3,46 @@
 import os
 import re
 import sys
-import bz2
 import math
-import shutil
-import sqlite3
-import urllib.request
-
-import xml.etree.ElementTree as et
+import threading
 from time import perf_counter as tpc
 from bisect import bisect_left
+from collections import OrderedDict
 
 from sd.common import rns, sig, rint, percent
 from sd.columns import auto_columns
 
+import mapped
+import symspell
+import autocomplete
+from dbpool import ReadPool
 import storage
-from languages import CACHE
-from letters import eprint, make_spellings
-from storage import dump_json, load_json, loading, print_elapsed, open_any
+from languages import USER_CACHE, language_cache
+from letters import eprint, make_spellings, TRANSLATIONS
+from profiler import phase
+from manifest import Manifest, file_stamp, have_module
+from freqcache import FreqCache
+from storage import dump_json, load_json, loading, print_elapsed, atomic_open, atomic_path
+
+
+ENTRY_BATCH = 500		# Words per query in get_entries, below the sqlite limit of 999 parameters in older versions
+ENTRY_CACHE = 4096		# Entries kept in memory by get_entry and get_entries
+
+# Increment a version to rebuild that cached artifact after changing the code that makes it
+BUILD_VERSIONS = dict(database=1, tree=1, titles=1, spelling=4, shared=1, symspell=symspell.VERSION, sections=2)
+
+# Modules only needed to build the cache are imported where they are used to keep startup fast.
 
 
 def strip_tags(text):
+	import xml.etree.ElementTree as et
 	# print("debug stripping", text)
 	tree = et.fromstring(text)
 	return et.tostring(tree, encoding='utf8', method='text').decode()
 
 
 def download_wiktionary():
+	import urllib.request
 	url = "https://dumps.wikimedia.org/enwiktionary/latest/enwiktionary-latest-pages-articles-multistream.xml.bz2"
 	filename = url.split("/")[-1]
 
@@ -56,7 +70,16 @@ def download_wiktionary():
 
 
 
+def find_wiktionary_dump():
+	"Return the dump that get_wiktionary_filename would try first without verifying or downloading it."
+	for filename in sorted(os.listdir('.')):
+		if re.match('^..wiktionary-.*multistream.xml.bz2', filename) and os.path.getsize(filename) >= 1e9:
+			return filename
+	return None
+
+
 def get_wiktionary_filename():
+	import bz2
 	# Find best bz2 file to read
 	matches = []
 	for filename in os.listdir('.'):
@@ -75,7 +98,7 @@ def get_wiktionary_filename():
 	matches.sort()
 	
 	
-	verify_file = os.path.join(CACHE, 'wiktionary.verified.txt')
+	verify_file = os.path.join(USER_CACHE, 'wiktionary.verified.txt')
 	
 	# Verify bz2 file
 	for filename in matches:
@@ -110,7 +133,7 @@ def get_wiktionary_filename():
 			continue
 					
 		size = os.path.getsize(filename)	
-		with open(verify_file, "w", encoding="utf-8") as vf:
+		with atomic_open(verify_file, "w", encoding="utf-8") as vf:
 			vf.write(f"{filename}\n{size}\n")		
 			
 		return filename
@@ -122,11 +145,12 @@ def get_wiktionary_filename():
 # print('Found file:', get_wiktionary_filename()); sys.exit()	# testing todo undo!!
 
 
-def make_freq_table(filename, show_odds=True, extended=False):
+def make_freq_table(filename, show_odds=True, extended=False, shared=False):
 	'''
 	Scan through frequency list and return words fpm
 	show_odds will show the chance of encountering a word if you learn at least a certain fpm
 		enabling adds a few hundredths of a second of load time
+	shared returns the mapped FreqCache instead of copying it into a dict
 	'''	
 	
 	start = loading("frequency table")
@@ -144,40 +168,12 @@ def make_freq_table(filename, show_odds=True, extended=False):
 		return freq_table, freq_table['__TOTAL__']
 	
 	
-	f = open_any(filename)
-		
-	total_count = 0
-	sums = []			# The sum of hits in the table at each word line
-	counts = []			# The raw hits at each word line
-	freq_table = dict()
-	for line in f:
-		line = line.strip().split()
-		if len(line) >= 2:
-			word = line[0]
-			if word.startswith('#'):
-				continue
-			try:
-				count = int(line[1].replace(',', ''))
-			except (ValueError, IndexError) as e:
-				eprint("Invalid line!", line, '\n', e)
-				continue
-			# total_count += count
-			freq_table[word] = count
-			if show_odds:
-				# sums.append(total_count)
-				counts.append(count)
-				
-	f.close()
-	print_elapsed(start)	
-	
-	# Sort counts Top to bottom and sum them up
-	# Doing it this way allows for non sorted frequency files
-	# only adds 0.01 seconds max
-	counts.sort(reverse=True)
-	for count in counts:
-		total_count += count
-		sums.append(total_count)
-
+	# The frequency list is parsed once into a mapped cache file holding the
+	# sorted counts and cumulative sums, so the odds below are just a few bisects.
+	cache = FreqCache(filename)
+	freq_table = cache if shared else cache.table()
+	total_count = cache.total
+	print_elapsed(start)
 
 	eprint("\tThis table was created by scanning at least", rns(total_count), 'words of text.')
 	eprint("\tFound", rns(len(freq_table)), 'unique words in frequency table.')
@@ -197,7 +193,8 @@ def make_freq_table(filename, show_odds=True, extended=False):
 		'''
 
 		# Print fpm targets
-		counts.reverse()					# Neccesary for bisect_left
+		counts = cache.sorted				# Sorted lowest to highest for bisect_left
+		sums = cache.sums
 		word_count = len(freq_table)
 		# print('\n\nTotal hits =', rns(total_count))
 		# print("Total words =", rns(word_count))
@@ -240,6 +237,7 @@ def create_index(cur, con):
 
 
 def make_data_base(dbname):
+	import sqlite3
 	if os.path.exists(dbname):
 		assert dbname.endswith('.db')
 		assert "wiktionary.words" in dbname
@@ -255,6 +253,59 @@ def make_data_base(dbname):
 
 
 
+def make_title_table(cur, filename):
+	"Write every title in the database to a sorted mapped file for fast membership tests"
+	words = sorted({word[0] for word in cur.execute("SELECT word FROM words")})
+	offsets, data = mapped.pack_strings(words)
+	mapped.write_tables(filename, {'words': data, 'words.offsets': offsets})
+
+
+def make_section_table(dbname, filename):
+	'''
+	Split every entry in the database into its sections so they can be read separately
+	pos is the nearest section above with definition lines, so a Translations section is filed under its Noun or Verb.
+	An entry where leaving out the REMOVED_SECTIONS wouldn't give the same text as clean_wikitext cutting them
+	is kept whole as a single section, so clean_wikitext still does the cutting for it.
+	'''
+	import sqlite3
+	from wikitext import split_sections, remove_sections, REMOVED_SECTIONS
+	src = ReadPool(dbname)
+	with atomic_path(filename) as tmp:
+		con = sqlite3.connect(tmp)
+		con.execute("CREATE TABLE sections(word, idx, heading, pos, body)")
+
+		seen = set()
+		rows = []
+		for word, entry in src.cursor().execute('select word, entry from words order by rowid'):
+			if word in seen:
+				continue			# get_entry only ever returns the first row of a word
+			seen.add(word)
+			entry = entry or ''
+			sections = split_sections(entry)
+			rebuilt = '\n'.join('' if heading in REMOVED_SECTIONS else body for heading, body in sections)
+			if remove_sections(rebuilt) != remove_sections(entry):
+				sections = [('', entry)]		# clean_wikitext cuts at a line that isn't a full heading
+			pos = ''
+			for idx, (heading, body) in enumerate(sections):
+				if '\n#' in body:
+					pos = heading
+				rows.append((word, idx, heading, pos, body))
+			if len(rows) >= 10000:
+				con.executemany('insert into sections values (?, ?, ?, ?, ?)', rows)
+				rows = []
+		con.executemany('insert into sections values (?, ?, ?, ?, ?)', rows)
+		con.execute("CREATE INDEX idx_sections ON sections (word, idx)")
+		con.commit()
+		con.close()
+		src.close()
+
+
+def enough_space(folder, size):
+	"Check for size bytes of free disk space before building a large cache file"
+	import shutil
+	return shutil.disk_usage(folder).free >= size
+
+
 def make_word_tree(roots):
 	'''Go through entire dictionary and build table of root words and all of their conjugations'''
 	wt = dict()			# wordtree of: word->subs
@@ -345,65 +396,196 @@ def display_digits(total):
 class Tree:
 	'''Load database and word tree derived from wiktionary'''
 
-	def __init__(self, freq_file, lang, debug=False):
+	def __init__(self, freq_file, lang, debug=False, shared=False):
 		overall_start = tpc()
 
 		self.debug = debug
+		self.shared = shared		# Memory map the tables so concurrent processes share one copy
 		self.langcode = lang[0].lower()
 		self.language = lang[1].title()
-		self.cache = os.path.join(CACHE, self.langcode)
+		self.cache = language_cache(self.langcode)
 		os.makedirs(self.cache, exist_ok=True)
+		if os.access(self.cache, os.W_OK):
+			storage.touch(self.cache)		# Least recently used caches are evicted first by --cachelimit
+		self.manifest = Manifest(self.cache, rebuild=debug >= 3)		# debug level 3 rebuilds everything
 
 		dbname = os.path.join(self.cache, 'wiktionary.words.db')
 		self.word_tree, self.reverse_tree = self.get_word_tree(dbname)
 
 		# Can't be threaded because of large data size
-		if not self.load_table(freq_file):
-			sys.exit(1)
+		self.completer = None			# Autocomplete index loaded on first use by complete
+		self.completer_freq = None		# Frequency file the completer was built for
+		self.definitions = None			# Reverse dictionary index loaded on first use by search_definitions
+		self.sections = None			# Sections table opened on first use by get_sections
+		self.typos = None				# Typo index loaded on first use by check_spelling
+		with phase("frequency table"):
+			if not self.load_table(freq_file):
+				sys.exit(1)
 
-		start = loading("wikitionary database")
-		self._con = sqlite3.connect(dbname)
-		self._cur = self._con.cursor()
-		
-			
-		self.words = {word[0] for word in self._cur.execute("SELECT word FROM words").fetchall()}
-		
-		print_elapsed(start)
-		create_index(self._cur, self._con)		# Create index if it wasn't created by earlier versions
+		with phase("title set"):
+			start = loading("wikitionary database")
+			self.dbname = dbname
+			# Read only connections opened on first use by _cur. Nothing writes to a read only cache, so it can skip locking.
+			self.db = ReadPool(dbname, immutable=not os.access(self.cache, os.W_OK))
+			self.entries = OrderedDict()	# Least recently used cache of word -> wiktionary entry
+			self._entry_lock = threading.Lock()
+
+			# Sorted, memory-mapped list of every title in the database
+			self.words = self.get_titles(dbname)
+			print_elapsed(start)
 
 
 
-		spelling_file = os.path.join(self.cache, 'spelling.json')
-		if not os.path.exists(spelling_file):
-			self.spellings = make_spellings(self.words)
-			dump_json(spelling_file, self.spellings)
-		start = loading("spelling tree")
-		self.spellings = load_json(spelling_file)	# Seems to be faster directly
+		with phase("spelling tree"):
+			# Memory-mapped dict of folded word -> titles, so only the words looked up are ever read
+			self.spellings, self.spelling_fold = self.get_spellings()
 
-		print_elapsed(start)
+		self.manifest.unlock()		# Every artifact is built, let other processes in
 		eprint("Loaded wiktionary database with", rns(len(self.words)), 'words available.')
 		if tpc() - overall_start < 60:
 			eprint("Total tree class loading time:", rns(tpc() - overall_start), 'seconds')
 
 
+	def get_titles(self, dbname):
+		"Load the title table or rebuild it if the database changed"
+		titles_file = os.path.join(self.cache, 'titles.map')
+		self.titles_file = titles_file
+		inputs = dict(database=file_stamp(dbname), version=BUILD_VERSIONS['titles'])
+		if not self.manifest.fresh('titles', inputs, titles_file):
+			import sqlite3
+			con = sqlite3.connect(dbname)
+			create_index(con.cursor(), con)		# Create index if it wasn't created by earlier versions
+			make_title_table(con.cursor(), titles_file)
+			con.close()
+			inputs['database'] = file_stamp(dbname)
+			self.manifest.record('titles', inputs)
+		return mapped.MappedFile(titles_file).strings('words')
+
+
+	def get_spellings(self):
+		'''
+		Load the map of words without accents to the titles they match, rebuilding it if the titles changed
+		Returns the map and the translate table to fold a word with before looking it up.
+		'''
+		spelling_file = os.path.join(self.cache, 'spelling.map')
+		inputs = dict(titles=file_stamp(self.titles_file), unidecode=have_module('unidecode'),
+					  version=BUILD_VERSIONS['spelling'])
+		if not self.manifest.fresh('spelling', inputs, spelling_file):
+			self.rebuilding('spelling', inputs)
+			start = loading("spelling map", header="Building")
+			spellings, letters = make_spellings(self.words.tolist())
+			mapped.write_tables(spelling_file, mapped.pack_dict(spellings, 'spelling'), fold=letters)
+			old = os.path.join(self.cache, 'spelling.json')
+			if os.path.exists(old):
+				os.remove(old)		# Replaced by spelling.map
+			self.manifest.record('spelling', inputs)
+			print_elapsed(start)
+		# The words are looked up with the same letters the map was folded with. Older maps only used TRANSLATIONS.
+		mf = mapped.MappedFile(spelling_file)
+		return mapped.MappedDict(mf, 'spelling'), str.maketrans(mf.header.get('fold', TRANSLATIONS))
+
+
+	def get_typo_index(self):
+		"Load the index of deletions used to correct typos, rebuilding it if the titles changed"
+		folder, manifest = self.optional_cache()
+		index_file = os.path.join(folder, 'symspell.map')
+		inputs = dict(titles=file_stamp(self.titles_file), version=BUILD_VERSIONS['symspell'])
+		if not manifest.fresh('symspell', inputs, index_file):
+			start = loading("typo index", header="\nBuilding")
+			symspell.build_index(self.words.tolist(), index_file)
+			print_elapsed(start)
+			manifest.record('symspell', inputs)
+		manifest.unlock()
+		return symspell.SymSpell(index_file, self.words)
+
+
+	@property
+	def _cur(self):
+		"Cursor of the calling thread. Ranking a list with --csv never connects."
+		return self.db.cursor()
+
+
 	def load_table(self, freq_file, **kargs):
 		if not os.path.exists(freq_file):
 			eprint("Error:", freq_file, "does not exist.")
 			return False
-		freq, total = make_freq_table(freq_file, **kargs)
+		freq, total = make_freq_table(freq_file, shared=self.shared, **kargs)
 		if freq and len(freq) >= 10:
 			self.freq, self.freq_total = freq, total
+			self.freq_file = freq_file
+			self.freq_key = tuple([os.path.abspath(freq_file)] + file_stamp(freq_file))		# For memos of Word results
 			return True
 		eprint("Error: frequency table not loaded.")
 		return False
 
 
+	def complete(self, prefix, limit=autocomplete.TOP):
+		"Most common titles and frequency list words starting with prefix"
+		if self.completer_freq != self.freq_file:
+			self.completer = self.get_completer()
+			self.completer_freq = self.freq_file
+		return self.completer.complete(prefix, limit)
+
+
+	def optional_cache(self):
+		"Folder and manifest for artifacts built on first use. A read only cache puts them in the user cache instead."
+		if not self.manifest.readonly:
+			return self.cache, self.manifest
+		folder = os.path.join(USER_CACHE, self.langcode)
+		os.makedirs(folder, exist_ok=True)
+		return folder, Manifest(folder)
+
+
+	def get_completer(self):
+		"Load the completion index or build it for the current frequency table"
+		folder, manifest = self.optional_cache()
+		index_file = os.path.join(folder, 'autocomplete.map')
+		inputs = dict(titles=file_stamp(self.titles_file), freq=[os.path.abspath(self.freq_file)] + file_stamp(self.freq_file),
+					  version=autocomplete.VERSION)
+		if not manifest.fresh('autocomplete', inputs, index_file):
+			start = loading("completion index", header="\nBuilding")
+			freq = self.freq if isinstance(self.freq, dict) else self.freq.table()
+			autocomplete.build_index(self.words.tolist() + list(freq), freq, index_file)
+			manifest.record('autocomplete', inputs)
+			print_elapsed(start)
+		manifest.unlock()
+		return autocomplete.Completer(index_file)
+
+
+	def search_definitions(self, text, pos=''):
+		"Reverse dictionary lookup: dict of word -> (pos, definition) for the definitions containing text"
+		if not self.definitions:
+			self.definitions = self.get_definitions()
+			if not self.definitions:
+				return dict()
+		return self.definitions.search(text, pos)
+
+
+	def get_definitions(self):
+		"Load the full-text index of definitions, building it on first use"
+		import definitions
+		if not definitions.have_fts5():
+			eprint("Error: This version of sqlite was built without the FTS5 extension needed to search definitions.")
+			return None
+		folder, manifest = self.optional_cache()
+		index_file = os.path.join(folder, 'definitions.db')
+		inputs = dict(database=file_stamp(self.dbname), version=definitions.VERSION)
+		if not manifest.fresh('definitions', inputs, index_file):
+			eprint("\nThe definitions index is built once, but it can take several minutes for a large language.")
+			start = loading("definitions index", header="Building")
+			definitions.build_index(self.dbname, index_file)
+			manifest.record('definitions', inputs)
+			print_elapsed(start)
+		manifest.unlock()
+		return definitions.Definitions(index_file)
+
+
 	def check_spelling(self, word):
-		'''Try to match a word without accents'''
+		'''Try to match a word without accents or with a typo'''
 		if word in self.words:
 			return word
-		if word in self.spellings:
-			cans = self.spellings[word]
+		cans = self.spellings.get(word.translate(self.spelling_fold))
+		if cans:
 			if len(cans) != 1:
 				eprint("\nDid you mean to type:", ' or '.join(cans), '?')
 				cans = {self.get_fpm(word):word for word in cans}
@@ -412,6 +594,16 @@ class Tree:
 				return word
 			eprint("\nCorrecting word:", word, 'to', cans[0])
 			return cans[0]
+		if not self.get_fpm(word):
+			# Nearest titles by edit distance, then the most common
+			if not self.typos:
+				self.typos = self.get_typo_index()
+			cans = sorted(self.typos.lookup(word), key=lambda can: (can[0], -self.get_fpm(can[1])))
+			if cans:
+				if len(cans) > 1:
+					eprint("\nDid you mean to type:", ' or '.join(can for _, can in cans[:5]), '?')
+				eprint("\nCorrecting typo:", word, 'to', cans[0][1])
+				return cans[0][1]
 		return word
 
 
@@ -466,9 +658,12 @@ class Tree:
 
 	def make_all_words(self, dbname):
 		"Go through wikitionary articles looking for spanish words and add their data to file."
+		import bz2
+		import sqlite3
 		con = sqlite3.connect(dbname)
 		cur = con.cursor()
 		wiktionary_file = get_wiktionary_filename()
+		self.dump_file = wiktionary_file
 
 		def commit():
 			"Write buffer of entries to database"
@@ -603,27 +798,53 @@ class Tree:
 		return root_dict
 
 
+	def database_inputs(self):
+		"Inputs of the sqlite database: the dump file and the code that parses it"
+		dump = find_wiktionary_dump()
+		if dump:
+			dump = [dump] + file_stamp(dump)
+		elif 'database' in self.manifest:
+			# The dump was deleted after building, so keep using the database
+			dump = self.manifest.data['database'].get('dump')
+		return dict(dump=dump, language=self.language, version=BUILD_VERSIONS['database'])
+
+
+	def rebuilding(self, name, inputs, manifest=None):
+		"Explain why an existing artifact is being rebuilt. manifest defaults to the language cache's."
+		manifest = manifest or self.manifest
+		if name in manifest and not manifest.rebuild:
+			changed = manifest.changed(name, inputs)
+			if changed:
+				eprint("\nRebuilding", name, "because these inputs changed:", ', '.join(changed))
+			else:
+				eprint("\nRebuilding", name, "because its file is missing")
+
+
 	def get_word_tree(self, dbname):
 		#  Cache Files
 		meta_file = os.path.join(self.cache, 'meta.json')
 		tree_file = os.path.join(self.cache, 'tree.json')
 		roots_file = os.path.join(self.cache, 'roots.json')
 		reverse_file = os.path.join(self.cache, 'reverse.json')
+		manifest = self.manifest
+		db_inputs = self.database_inputs()
 
 
-		# The meta file stores current state
-		if os.path.exists(meta_file) and self.debug < 3:
+		# Caches made before the manifest only have a meta file with the current state
+		if 'database' not in manifest and os.path.exists(meta_file) and not manifest.rebuild:
 			meta = load_json(meta_file)
-
-		else:
-			meta = dict(words_finished=False, tree_finished=False)
+			if meta.get('words_finished'):
+				manifest.record('database', db_inputs)
+			if meta.get('tree_finished'):
+				manifest.record('tree', dict(roots=file_stamp(roots_file), version=BUILD_VERSIONS['tree']))
 
 
 		# Create sqlite database for words from wiktionary
-		if not meta['words_finished']:
+		if not manifest.fresh('database', db_inputs, dbname, roots_file):
+			self.rebuilding('database', db_inputs)
 
 			# Current "en" folder is 751 MB so I'm setting a minimum HDD space of a gig
-			if shutil.disk_usage(self.cache).free < 1e9:
+			if not enough_space(self.cache, 1e9):
 				eprint("You should probably clear up some hard drive space before running this.")
 				sys.exit(1)
 
@@ -636,12 +857,18 @@ class Tree:
 
 			# Save roots to file
 			dump_json(roots_file, roots)
-			meta['words_finished'] = True
-			dump_json(meta_file, meta)
+			db_inputs['dump'] = [self.dump_file] + file_stamp(self.dump_file)
+			manifest.record('database', db_inputs)
+
+
+		# Split the entries into sections so get_entry can leave out the ones clean_wikitext removes
+		self.get_section_table(dbname)
 
 
 		# Make the word tree associating words and roots
-		if not meta['tree_finished']:
+		tree_inputs = dict(roots=file_stamp(roots_file), version=BUILD_VERSIONS['tree'])
+		if not manifest.fresh('tree', tree_inputs, tree_file, reverse_file):
+			self.rebuilding('tree', tree_inputs)
 			roots = load_json(roots_file)
 			word_tree, reverse_tree = make_word_tree(roots)
 
@@ -651,8 +878,12 @@ class Tree:
 				dump_json(tree_file, word_tree)
 				eprint("Writing reverse word tree to .json")
 				dump_json(reverse_file, reverse_tree)
-				meta['tree_finished'] = True
-				dump_json(meta_file, meta)
+
+				# The csv copy of the tree is converted from the json on the next load
+				tree_csv = os.path.splitext(tree_file)[0] + '.csv'
+				if os.path.exists(tree_csv):
+					os.remove(tree_csv)
+				manifest.record('tree', tree_inputs)
 			else:
 				eprint('''
 			The word tree is empty.
@@ -665,18 +896,80 @@ class Tree:
 				sys.exit(1)
 
 
+		if self.shared:
+			with phase("word tree"):
+				start = loading("shared word tree")
+				trees = self.load_shared('tree.map', tree=(tree_file, 3), reverse=(reverse_file, 0))
+				print_elapsed(start)
+			return trees['tree'], trees['reverse']
+
 		# Load word tree
-		start = loading("word tree")
-		word_tree = storage.convert_and_load(tree_file, chunk=3, use_json=False)
-		print_elapsed(start)
+		with phase("word tree"):
+			start = loading("word tree")
+			word_tree = storage.convert_and_load(tree_file, chunk=3, use_json=False)
+			print_elapsed(start)
 
-		start = loading("reverse tree")
-		reverse_tree = load_json(reverse_file)
-		print_elapsed(start)
+		with phase("reverse tree"):
+			start = loading("reverse tree")
+			reverse_tree = load_json(reverse_file)
+			print_elapsed(start)
 
 		return word_tree, reverse_tree
 
 
+	def get_section_table(self, dbname):
+		'''
+		Build the sections table after the database, which needs about as much disk space again
+		Sets self.sections_file, or None when there isn't one. get_entry reads the full entries without it.
+		'''
+		sections_file = os.path.join(self.cache, 'sections.db')
+		inputs = dict(database=file_stamp(dbname), version=BUILD_VERSIONS['sections'])
+		self.sections_file = None
+		if self.manifest.readonly:
+			# Only use a table the admin built. A missing one isn't worth stopping for.
+			if self.manifest.data.get('sections') == inputs and os.path.exists(sections_file):
+				self.sections_file = sections_file
+			return
+		if not self.manifest.fresh('sections', inputs, sections_file):
+			self.rebuilding('sections', inputs)
+			if not enough_space(self.cache, max(1e9, os.path.getsize(dbname))):
+				eprint("\nNot enough free disk space to split the entries into sections. Reading whole entries instead.")
+				return
+			start = loading("entry sections", header="\nSplitting")
+			make_section_table(dbname, sections_file)
+			self.manifest.record('sections', inputs)
+			print_elapsed(start)
+		self.sections_file = sections_file
+
+
+	def load_shared(self, map_name, **sources):
+		'''
+		Memory map copies of json caches for --shared
+		sources = table name -> (json filename, chunk size of the values)
+		Returns a dict of table name -> MappedDict
+		'''
+		inputs = {name: file_stamp(filename) for name, (filename, _) in sources.items()}
+		inputs['version'] = BUILD_VERSIONS['shared']
+		folder, manifest = self.cache, self.manifest
+		if manifest.readonly and not (manifest.data.get(map_name) == inputs and os.path.exists(os.path.join(folder, map_name))):
+			# A read only cache without an up to date map gets one in the user cache
+			folder, manifest = self.optional_cache()
+		map_file = os.path.join(folder, map_name)
+		if not manifest.fresh(map_name, inputs, map_file):
+			self.rebuilding(map_name, inputs, manifest)
+			tables = dict()
+			for name, (filename, chunk) in sources.items():
+				data = storage.convert_and_load(filename, chunk=chunk) if chunk else load_json(filename)
+				tables.update(mapped.pack_dict(data, name, chunk=chunk))
+			mapped.write_tables(map_file, tables)
+			manifest.record(map_name, inputs)
+		if manifest is not self.manifest:
+			manifest.unlock()
+
+		mf = mapped.MappedFile(map_file)
+		return {name: mapped.MappedDict(mf, name, chunk=chunk) for name, (_, chunk) in sources.items()}
+
+
 	def find_root(self, word, silent=False):
 		'''Find the best root of a word'''
 		# todo allow limited depth search
@@ -709,14 +1002,81 @@ class Tree:
 		return hits / self.freq_total * 1e6
 
 
-	def get_entry(self, word):
-		if word in self.words:
-			if '"' in word:
-				return "Skipping entry for " + word
-			entry = self._cur.execute('select entry from words where word=' + '"' + word + '"').fetchone()
-			if entry:
-				return entry[0]
-		return ''
+	def get_entry(self, word, skip=()):
+		'''
+		skip = tuple of section headings to leave blank. They are never read from the disk.
+		Without a sections table the whole entry is returned and clean_wikitext removes them instead.
+		'''
+		if skip and self.sections_file:
+			return self.get_entries([word], skip)[word]
+		if word not in self.words:
+			return ''
+		with self._entry_lock:
+			if word in self.entries:
+				self.entries.move_to_end(word)
+				return self.entries[word]
+		# sqlite3 keeps the prepared statement for this query string between calls
+		entry = self._cur.execute('select entry from words where word=?', (word,)).fetchone()
+		return self.remember_entry(word, entry[0] if entry else '')
+
+
+	def get_entries(self, words, skip=()):
+		'''
+		Fetch the entries of many words with a few large queries instead of one per word
+		Returns a dict of word -> entry and leaves them in the entry cache for get_entry.
+		skip = tuple of section headings to leave blank, see get_sections
+		'''
+		if not self.sections_file:
+			skip = ()
+		out = dict()
+		missing = []
+		with self._entry_lock:
+			for word in dict.fromkeys(words):
+				key = (word, skip) if skip else word
+				if key in self.entries:
+					out[word] = self.entries[key]
+				elif word in self.words:
+					missing.append(word)
+				else:
+					out[word] = ''
+
+		for start in range(0, len(missing), ENTRY_BATCH):
+			chunk = missing[start:start + ENTRY_BATCH]
+			if skip:
+				found = self.get_sections(chunk, skip)
+			else:
+				found = dict()
+				query = 'select word, entry from words where word in (' + ','.join('?' * len(chunk)) + ') order by rowid'
+				for word, entry in self._cur.execute(query, chunk):
+					found.setdefault(word, entry)		# Same row that get_entry would return
+			for word in chunk:
+				out[word] = self.remember_entry((word, skip) if skip else word, found.get(word) or '')
+		return out
+
+
+	def get_sections(self, words, skip):
+		'''
+		Rebuild the entries of words from the sections table with the sections in skip left blank
+		The blank sections keep their place, so the text is the same as cutting them out of the full entry.
+		'''
+		if not self.sections:
+			self.sections = ReadPool(self.sections_file, immutable=self.manifest.readonly)
+		marks = ','.join('?' * len(skip))
+		query = "select word, case when heading in (" + marks + ") then '' else body end from sections " \
+				"where word in (" + ','.join('?' * len(words)) + ") order by word, idx"
+		found = dict()
+		for word, body in self.sections.cursor().execute(query, list(skip) + list(words)):
+			found.setdefault(word, []).append(body)
+		return {word: '\n'.join(bodies) for word, bodies in found.items()}
+
+
+	def remember_entry(self, word, entry):
+		"Add an entry to the least recently used cache. word can also be a (word, skip) key."
+		with self._entry_lock:
+			self.entries[word] = entry
+			if len(self.entries) > ENTRY_CACHE:
+				self.entries.popitem(last=False)
+		return entry
 
 
 
@@ -735,142 +1095,118 @@ class Tree:
 		return baseline
 
 
-	def total_freq(self, word, args, branch=None, silent=False):
-		book = args.book
-		nostars = not args.stars
-		highstars=args.starval
-	
-		"Look up any word and return fpm of all conjugations combined."
-		root = self.find_root(word, silent=True) or word
-
-		book_total = 0		# Words in book
-		high_total = 0		# Total of words with *
-		high_book = 0		# Words in book that are listed with *
-
+	def select_subs(self, root, branch, baseline, highstars):
+		'''
+		Choose which conjugations of root count towards its total
+		Returns an ordered dict of sub -> (hits, tag, subroot, high)
+		high is True for unusually common words that get a * for further review
+		'''
 		subs = self.word_tree.get(root, []).copy()
 		subs.append((root, '', ''))
 		subs.sort()
-		found = dict()		# dict of subs to be used in output
-
-
-		# print('subs', subs)
-		# print('word', word, 'branch', branch)
 
-		# Count up hits in frequency table
-		all_hits = {sub:self.get_fpm(sub) for sub, _, _ in subs}
-		total_hits = 0
-		baseline = self.calc_baseline(root, word, branch, silent=silent)
-
-		# print(all_hits, total_hits)
-
-		out = [['Conj:', 'FPM:', '', "Wikitags:"]]
-		if book:
-			out[0].insert(2, 'Book:')
-			if args.bookfpm:
-				out[0].insert(3, 'BFPM:')
-
-
-		# Choose which subs to include and count up totals
+		found = dict()
 		for sub, tag, subroot in subs:
-			def add_sub():
-				nonlocal total_hits, high_total, high_book
-				if sub in found:
-					return
-				total_hits += hits		
-				# The original root gets an R, unsually common words get a * for further review
-				high = 'R' if sub == root else ''
-				if not high:
-					if hits / baseline >= highstars:
-						high_total += hits
-						high_book  += bc
-						high = '*' * int(math.log((hits / baseline) / highstars, 2))		
-				found[sub] = dict(tag=tag, subroot=subroot, high=high)
+			if sub in found:
+				continue
+			# Match only words with tag linking back to branch
+			if branch and subroot != branch and sub != branch:
+				continue
+			hits = self.get_fpm(sub)
+			found[sub] = (hits, tag, subroot, sub != root and hits / baseline >= highstars)
+		return found
 
-		
-			#Add up hits if it's a new sub
-			hits = all_hits[sub]
-			if sub not in found:
-				bc = book.get(sub, 0) if book else 0		# book count of sub
-				if branch:
-					# Match only words with tag linking back to branch
-					if subroot == branch or sub == branch:	# pylint:disable=consider-using-in
-						add_sub()
-					else:
-						continue						
-			add_sub()
-		
-		
-		#for sub, info in found.items():
-		#	print(sub, info)
-					
 
+	def total_freq(self, word, args, branch=None, silent=False):
+		'''
+		Look up any word and return fpm of all conjugations combined.
+		find_dupes calls this silently for every word, so the totals are counted
+		without formatting anything and the table is only built when shown.
+		'''
+		book = args.book
+		root = self.find_root(word, silent=True) or word
+		baseline = self.calc_baseline(root, word, branch, silent=silent)
+		found = self.select_subs(root, branch, baseline, args.starval)
 
+		total_hits = 0
+		high_total = 0		# Total of words with *
+		high_book = 0		# Words in book that are listed with *
+		for sub, (hits, _, _, high) in found.items():
+			total_hits += hits
+			if high:
+				high_total += hits
+				if book:
+					high_book += book.get(sub, 0)
 
-		# Show everything if not many skipped lines, else print lines above threshold
-		skipped = 0			# Number of words with hits below threshold
-		# Make output
-		last = ''
+		# Subs below the display threshold are left out of the book total
 		digits = display_digits(total_hits)
 		if args.showall:
 			threshold = -1
 			digits += 2
 		else:
 			threshold = 10**(-digits) if total_hits > 0 else 0.001
-		
-		for sub, info in found.items():
-			tag = ' '.join((info['tag'], info['subroot'])).strip()
-			
-			if sub == last:
-				# If the same sub has multiple tags:
-				if tag:
-					if book:
-						if args.bookfpm:
-							out.append(('', '', '', '', '', tag))
-						else:
-							out.append(('', '', '', '', tag))
-					else:
-						out.append(('', '', '', tag))
-			else:
-				last = sub		
-				hits = all_hits[sub]
-				
-				# Don't show subs below threshold
-				if hits < threshold and sub != root and sub != word:
-					skipped += 1
-					continue
+		book_total = 0		# Words in book
+		if book:
+			for sub, (hits, _, _, _) in found.items():
+				if hits >= threshold or sub == root or sub == word:
+					book_total += book.get(sub, 0)
 
-					
-				bc = book.get(sub, 0) if book else 0	
-				book_total += bc	
-				#
-				line = [sub, fmt_fpm(hits, digits=digits), info['high'], tag]
-				if book:
-					line.insert(2, fmt_fpm(bc) or '')
-					if args.bookfpm:
-						line.insert(3, fmt_fpm(bc / book['__TOTAL__'] * 1e6, digits) or '') # also show book fpm
-				out.append(line)		
-	
-	
 		# nostars mode removes * words from total
-		if nostars:
+		if not args.stars:
 			total_hits -= high_total
-			book_total -= high_book		
-	
+			book_total -= high_book
+
 		if not silent:
-			auto_columns(out, space=2, printme=True)
-			if skipped:
-				print("(skipped showing", skipped, f'conjugations below threshold of {threshold} \n')
+			self.show_subs(found, root, word, args, baseline, threshold, digits)
 			if high_total:
-				if nostars:
+				if not args.stars:
 					print("Total with stars words would have been:", fmt_fpm(total_hits + high_total), 'fpm')
 				else:
 					print("(total without abnormally high * words is", str(fmt_fpm(total_hits - high_total)) + ')')
 
-					
 		return total_hits, book_total
 
 
+	def show_subs(self, found, root, word, args, baseline, threshold, digits):
+		"Print the table of conjugations chosen by select_subs"
+		book = args.book
+		out = [['Conj:', 'FPM:', '', "Wikitags:"]]
+		if book:
+			out[0].insert(2, 'Book:')
+			if args.bookfpm:
+				out[0].insert(3, 'BFPM:')
+
+		# Show everything if not many skipped lines, else print lines above threshold
+		skipped = 0			# Number of words with hits below threshold
+		for sub, (hits, tag, subroot, high) in found.items():
+			# Don't show subs below threshold
+			if hits < threshold and sub != root and sub != word:
+				skipped += 1
+				continue
+
+			# The original root gets an R, unsually common words get a * for further review
+			if sub == root:
+				mark = 'R'
+			elif high:
+				mark = '*' * int(math.log((hits / baseline) / args.starval, 2))
+			else:
+				mark = ''
+			line = [sub, fmt_fpm(hits, digits=digits), mark, ' '.join((tag, subroot)).strip()]
+			if book:
+				bc = book.get(sub, 0)
+				line.insert(2, fmt_fpm(bc) or '')
+				if args.bookfpm:
+					line.insert(3, fmt_fpm(bc / book['__TOTAL__'] * 1e6, digits) or '') # also show book fpm
+			out.append(line)
+
+		auto_columns(out, space=2, printme=True)
+		if skipped:
+			print("(skipped showing", skipped, f'conjugations below threshold of {threshold} \n')
+
+
 
 
 	def close(self,):
-		self._con.close()
+		self.db.close()
+		if self.sections:
+			self.sections.close()
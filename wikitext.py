@@ -47,6 +47,8 @@ IGNORE_TEMPLATES = {
 	"support", "oppose", "WOTD", "FWOTD", "COTD"
 }
 
+# Sections dropped by clean_wikitext
+REMOVED_SECTIONS = ('Conjugation', 'Descendants', 'Pronunciation', 'References', 'Further reading')
 
 
 
@@ -323,18 +325,71 @@ def replace_brackets(m):
 		return capitalize_first(m.group(1))
 		
 
+def split_sections(text):
+	'''
+	Split an entry into a list of (heading, text) for each section.
+	The text of a section starts with its heading line, so joining them with newlines gives back the entry.
+	Anything before the first heading has an empty heading.
+	'''
+	out = []
+	heading = ''
+	lines = []
+	for line in text.split('\n'):
+		match = re.fullmatch(r"(=+)\s*([^=].*?)\s*\1\s*", line)
+		if match:
+			if lines:
+				out.append((heading, '\n'.join(lines)))
+			heading = match.group(2)
+			lines = []
+		lines.append(line)
+	if lines:
+		out.append((heading, '\n'.join(lines)))
+	return out
+
+
+def clean_definition(line):
+	"Reduce a single definition line to plain text"
+	line = re.sub(r"\[\[(?:[^\]|]*\|)?([^\]|]+)\]\]", r"\1", line)
+	line = process_templates(line)
+	line = re.sub(r"&lt;ref&gt;.*?&lt;/ref&gt;", "", line)
+	line = html.unescape(line).replace("'''", '').replace("''", '')
+	return ' '.join(line.split())
+
+
+def definition_lines(text):
+	'''
+	Yield (heading, definition) for every definition line in an entry
+	Examples and quotes under a definition are skipped, as are lines like {{inflection of|...}} that only point to another word.
+	'''
+	for heading, section in split_sections(text):
+		for line in section.split('\n'):
+			if not line.startswith('#'):
+				continue
+			line = line.lstrip('#')
+			if line[:1] in ':*' or re.match(r"\s*\{\{[^|}]*\bof\b", line):
+				continue
+			line = clean_definition(line)
+			if line:
+				yield heading, line
+
+
+def remove_sections(text):
+	"First step of clean_wikitext: drop the </text> tag and the REMOVED_SECTIONS"
+	# Remove the "</text>" tag
+	text = text.replace("</text>", "")
+
+	# Remove unwanted sections
+	# text = re.sub(r"=+\s*(Conjugation|Descendants|Pronunciation|References|Further reading)\s*=+.*?(?==+[^=]|$)", "", text, flags=re.DOTALL)	
+	return re.sub(r"=+\s*(" + '|'.join(REMOVED_SECTIONS) + r")\s*=+.*?(?=\n=+|$)", "", text, flags=re.DOTALL )
+
+
 def clean_wikitext(text):
 	# Clean_wikitext is throwing away formatting without saving much filesize, 
 	# So we keep the original in the database just in case this function needs tweaking later
 	# or the we want to display it differently (perhaps in a GUI someday?)
 	
 	
-	# Remove the "</text>" tag
-	text = text.replace("</text>", "")
-
-	# Remove unwanted sections
-	# text = re.sub(r"=+\s*(Conjugation|Descendants|Pronunciation|References|Further reading)\s*=+.*?(?==+[^=]|$)", "", text, flags=re.DOTALL)	
-	text = re.sub(r"=+\s*(Conjugation|Descendants|Pronunciation|References|Further reading)\s*=+.*?(?=\n=+|$)", "", text, flags=re.DOTALL )
+	text = remove_sections(text)
 	# print('debug unwanted sections', text, '\n\n\n')
 	
 	
@@ -6,7 +6,7 @@ import math
 import traceback
 
 from tree import show_fpm
-from wikitext import clean_wikitext
+from mybook import book_key
 from sd.columns import auto_columns
 
 # Testing: ./word.py (dupefactor)
@@ -41,21 +41,42 @@ def log_weighted_avg(a, b, factor=1, verbose=False):
 
 	
 
+def entry_skip(wikiclean):
+	"Sections of an entry that won't be shown, so they don't need to be read"
+	if wikiclean == 1:
+		from wikitext import REMOVED_SECTIONS
+		return REMOVED_SECTIONS
+	return ()
+
+
 class Word:
 	"Calculate a word's root and fpm"
 
-	def __init__(self, word, tree, args, branch=None):
+	# Long lists make a Word for every root, so they don't carry a __dict__ each
+	__slots__ = ('extra', 'word', 'branch', 'dupes', 'fpm', 'root', 'derived', 'book_fpm', 'book_count')
+
+	def __init__(self, word, tree, args, branch=None, memo=None):
+		'''
+		memo is an optional dict shared by the Words of one run.
+		A word seen before skips the root and frequency lookups.
+		'''
 		self.extra = []
 		if type(word) == list:
 			self.extra = word[1:]
 			word = word[0]
 		self.word = word
-		self.fpm = tree.get_fpm(word)
 		self.branch = branch
-		
 		self.dupes = 1		# Duplicates found of this word
-		self.root = tree.find_root(word, silent=True) or word
-		self.derived, book_count = self.get_freq(tree, args)
+
+		key = self.memo_key(word, tree, args, branch) if memo is not None else None
+		if key and key in memo:
+			self.fpm, self.root, self.derived, book_count = memo[key]
+		else:
+			self.fpm = tree.get_fpm(word)
+			self.root = tree.find_root(word, silent=True) or word
+			self.derived, book_count = self.get_freq(tree, args)
+			if key:
+				memo[key] = (self.fpm, self.root, self.derived, book_count)
 
 		# Book fpm
 		self.book_fpm = 0
@@ -64,6 +85,28 @@ class Word:
 			self.book_fpm = book_count / args.book['__TOTAL__'] * 1e6 if args.book else 0
 
 
+	@classmethod
+	def restore(cls, word, root, fpm, derived, dupes=1, book_fpm=0, book_count=0, extra=()):
+		"Remake a Word from its saved results without looking anything up"
+		self = cls.__new__(cls)
+		self.extra = list(extra)
+		self.word = word
+		self.branch = None
+		self.dupes = dupes
+		self.fpm = fpm
+		self.root = root
+		self.derived = derived
+		self.book_fpm = book_fpm
+		self.book_count = book_count
+		return self
+
+
+	@staticmethod
+	def memo_key(word, tree, args, branch=None):
+		"Everything that changes the result of get_freq"
+		return (word, branch, tree.freq_key, book_key(args.book), args.stars, args.starval, args.showall)
+
+
 	def get_freq(self, tree, args, silent=True):
 		# total_freq
 		# threshold = args.threshold if threshold == -1 else threshold
@@ -139,6 +182,8 @@ class Word:
 
 
 	def print_entry(self, tree, root=True, wikiclean=1):
+		from wikitext import clean_wikitext		# Only imported when entries are shown
+
 		def print_wikiclean(entry):
 			try:
 				print(clean_wikitext(entry))
@@ -154,7 +199,7 @@ class Word:
 			word = self.root or self.word
 		else:
 			word = self.word
-		entry = tree.get_entry(word)
+		entry = tree.get_entry(word, skip=entry_skip(wikiclean))
 		if entry:
 			print("\nWiktionary entry for:", word, '\n')
 			# print('debug wikiclean', wikiclean)
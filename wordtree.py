@@ -10,21 +10,29 @@ from bisect import bisect_right
 from time import perf_counter as tpc
 
 
-import myanki
+import daemon
 import mybook
+import parallel
+import profiler
+import results
+import scoring
+import roottable
+from resultset import ResultSet
 from sd.common import rns
-from manual import manual_input
 from sd.columns import auto_columns
-from languages import LANGCODES, CACHE
+from languages import LANGCODES, CACHE, USER_CACHE
 from letters import strip_punct, eprint
-from word import Word, log_weighted_avg
+from word import Word, entry_skip
 from args import parse_args
 from storage import make_or_load_json, dump_json
-from tree import Tree, fmt_fpm, loading, show_fpm
+from tree import Tree, fmt_fpm, loading, show_fpm, ENTRY_BATCH
 
 	
+VERSION = "1.20.0"
+
+
 def show_version():
-	eprint("\nWordTree version: 1.20.0")
+	eprint("\nWordTree version:", VERSION)
 	# Version History:
 	# 1.1 New --lang features 
 	# 1.2 Added option a in manual mode to show all conjugations
@@ -166,6 +174,7 @@ def load_anki(args):
 	'''
 	Get existing anki cards and make a searchable dict of Question words->Matching Notes
 	'''
+	import myanki
 	anki = dict()
 	loading("anki database", newline=True)
 	notes = myanki.getnotes(args.anki)
@@ -211,7 +220,7 @@ def meta_usage(manual_mode):
 		else:
 			meta[key] += 1
 
-	filename = os.path.join(CACHE, 'usage.json')
+	filename = os.path.join(USER_CACHE, 'usage.json')
 	meta = make_or_load_json(filename, create)
 	if manual_mode:
 		increment('manual')
@@ -257,13 +266,15 @@ def output_csv(ranked, ofile, book_freq):
 		writer = csv.writer(csvfile)
 		if book_freq:
 			writer.writerow("Word Root FPM Total_FPM Book_Count Book_FPM Ratio".split())
-			for word in ranked:
-				ratio = round(word.book_fpm / word.fpm,1) if word.fpm else 0
-				writer.writerow([word.word, word.root, fmt_fpm(word.fpm), fmt_fpm(word.derived), word.book_count, word.book_fpm, ratio])
+			# Read straight from the columns of the ResultSet instead of making a Word for each row
+			for word, root, fpm, derived, book_count, book_fpm in \
+				zip(ranked.words, ranked.roots, ranked.fpm, ranked.derived, ranked.book_count, ranked.book_fpm):
+				ratio = round(book_fpm / fpm,1) if fpm else 0
+				writer.writerow([word, root, fmt_fpm(fpm), fmt_fpm(derived), book_count, book_fpm, ratio])
 		else:
 			writer.writerow("Word Root FPM Total_FPM".split())
-			for word in ranked:
-				writer.writerow([word.word, word.root, fmt_fpm(word.fpm)])
+			for word, root, fpm in zip(ranked.words, ranked.roots, ranked.fpm):
+				writer.writerow([word, root, fmt_fpm(fpm)])
 			
 		
 
@@ -271,11 +282,21 @@ def output_csv(ranked, ofile, book_freq):
 	return True
 
 
-def find_dupes(words, tree, args):
-	"Convert a list of raw words into word objects with dupe counts"
+def find_dupes(words, tree, args, jobs=None, quiet=False, memo=None):
+	'''
+	Convert a list of raw words into word objects with dupe counts
+	jobs = number of processes, defaults to --jobs
+	memo = dict of results shared with Word, filled in by the run
+	'''
+	if memo is None:
+		memo = dict()		# Repeated words in the list are only looked up once
+	jobs = parallel.job_count(args.jobs if jobs is None else jobs)
+	if jobs > 1 and len(words) >= parallel.MIN_WORDS and parallel.can_fork():
+		return parallel.find_dupes(words, tree, args, jobs, find_dupes, memo)
+
 	unranked = dict()				# raw word->word object
 	processed = 0
-	if words:
+	if words and not quiet:
 		eprint("\nCalculating the frequency and root of every word in the list of", rns(len(words)))
 
 	
@@ -294,12 +315,12 @@ def find_dupes(words, tree, args):
 	start = tpc()	
 	for raw in words:
 		processed += 1
-		if not processed % 1000 and len(words) > 3000:
+		if not processed % 1000 and len(words) > 3000 and not quiet:
 			if not processed % (1000 * 10) or processed < 1000 * 10:
 				wps = int(processed / (tpc() - start))
 				eprint("Processed", rns(processed), 'words at', rns(wps), 'per second:', word.word)
 				
-		word = Word(raw, tree, args)
+		word = Word(raw, tree, args, memo=memo)
 		root = word.root
 		if root in unranked:
 			unranked[root].dupes += 1
@@ -313,51 +334,31 @@ def sci(number):
 	return "{:.1e}".format(number)
 		
 		
-def rank_list(words, tree, args):
-	"Rank the list of words and return Word objects"
-	ranked = []		# words resorted by adj factor
-	unranked = find_dupes(words, tree, args)
+def rank_list(words, tree, args, memo=None):
+	"Rank the list of words and return a ResultSet, which gives Word objects when iterated"
+	if roottable.usable(args):
+		# The word list is every root in the tree, which has its totals saved in the root table
+		unranked = roottable.find_dupes(tree, args, lambda: find_dupes(words, tree, args))
+	else:
+		unranked = find_dupes(words, tree, args, memo=memo)
 	
 	
 	# Sort words by adjusted value
-	for word in unranked.values():
-		if not word.skipped(args):			
-			fpm = word.calc_adj(args)
-			
-			# apply sortfactor if valid
-			adj = fpm
-			if word.fpm:
-				'''
-				adj = (fpm / word.fpm) ** (args.sortfactor/100)
-				# print('adj =', adj, word.fpm, fpm, word.fpm * adj, word.word)
-				fpm = word.fpm * adj
-				'''
-				
-				# example: a factor of 10 means the original fpm is weighted 1/10 toward the word fpm
-				adj = log_weighted_avg(word.fpm, fpm, args.sortfactor/100)
-				if word.fpm < 0.01:
-					pass # print(percent(adj/fpm), word.word, sci(word.fpm), sci(fpm), sci(adj))
-				
-					
-				#if word.dupes >= 2:
-				#	print(word.dupes, word.word)
-				# print(word.fpm, fpm, 'sort =', adj, '\n\n')
-					
-			ranked.append((adj, word))
-			# print("Ranking", ranked[-1])
-			
+	words = scoring.select(list(unranked.values()), args)
+	values = scoring.scores(words, args)
+
+	# Only the words between --start and --stop are kept. Negative values count from the end.
+	start, stop = int(args.start), int(args.stop) if args.stop else None
 	if args.nosort:
 		eprint("List was not sorted.")
+		rows = range(len(words))[:stop][start:]
 	else:
 		eprint("Sorting list...")
-		ranked.sort(key=lambda x: x[0], reverse=not args.reverse)
-
+		rows = scoring.window(range(len(words)), start, stop, reverse=args.reverse, key=values.__getitem__)
+	ranked = ResultSet()
+	for row in rows:
+		ranked.append(words[row], values[row])
 
-	if args.stop:
-		ranked = ranked[:int(args.stop)]
-	if args.start:
-		ranked = ranked[int(args.start):]
-		
 
 
 	if len(unranked) >= 100:
@@ -375,7 +376,7 @@ def rank_list(words, tree, args):
 		fpms.append(0)
 		fpms.reverse()
 		bins = [0] * len(fpms)
-		for f, _ in ranked:
+		for f in ranked.score:
 			b = bisect_right(fpms, f) - 1
 			# eprint(f, b, fpms[b])
 			bins[b] += 1
@@ -389,8 +390,8 @@ def rank_list(words, tree, args):
 			eprint(text.ljust(20), bins[i])		
 		# eprint("\n\nPress Enter to see result:"); input()
 
-	# Return the sorted list of words
-	return [row[1] for row in ranked]
+	# Return the sorted words
+	return ranked
 	
 
 def cumulative_word_percentiles(word_count):
@@ -528,12 +529,27 @@ def process_list(words, tree, args):
 	if args.ignore:
 		words = ignore_words(words, args.ignore)
 
-	# Sort the words into a list of ranked Word objects
-	ranked = rank_list(words, tree, args)
+	# Words from earlier runs of a list are read from the saved results instead of being looked up
+	saved = results.ResultCache(tree, args) if results.usable(args) else None
+	memo = saved.make_memo(tree, args) if saved else None
+	old_roots = saved.roots() if saved and args.delta else None
+	if args.delta and not saved:
+		eprint("--delta only works with a word list file.")
+
+	# Sort the words into a ResultSet of ranked words
+	ranked = rank_list(words, tree, args, memo=memo)
+	if saved:
+		saved.update(memo, ranked)
 
 	if args.csv:
 		return output_csv(ranked, args.csv, args.book)
 
+	if old_roots is not None:
+		# The csv has the whole list merged together, but only the new words are shown again
+		count = len(ranked)
+		ranked = ranked.take(row for row, root in enumerate(ranked.roots) if root not in old_roots)
+		eprint("\nSkipping", count - len(ranked), "words shown in earlier runs of this list.")
+
 	eprint("\n\nDone! Here are the words with definitions.")
 	with open('warning.txt') as f:
 		for line in f.readlines():
@@ -552,6 +568,9 @@ def process_list(words, tree, args):
 	for count, word in enumerate(ranked):
 		if count and not count % 1000:
 			eprint("Processing word:", rns(count), 'of', rns(len(ranked)))
+		if not args.noentry and not count % ENTRY_BATCH:
+			# Fetch the next batch of entries in one query
+			tree.get_entries([item.root or item.word for item in ranked[count:count + ENTRY_BATCH]], skip=entry_skip(args.wikiclean))
 		print('\n' * 5)
 		word.print_info(tree, args)
 		if not args.noentry:
@@ -568,17 +587,55 @@ def main():
 		print(args)
 	os.chdir(sys.path[0])		# change to local dir
 	show_version()
+	eprint("Using cache folder:", CACHE)
+	if USER_CACHE != CACHE:
+		eprint("Using user cache folder:", USER_CACHE)
+	os.makedirs(USER_CACHE, exist_ok=True)
+
+	if args.cacheinfo or args.cachelimit or args.compact:
+		import cachetool
+		return cachetool.manage(args)
+
+	# Hand the work to a resident daemon if one is running
+	if args.stopdaemon:
+		return daemon.stop(args.lang[0])
+	if not (args.daemon or args.nodaemon or args.debug or args.profile_startup):
+		status = daemon.client(args)
+		if status is not None:
+			return status
+
+	if args.profile_startup:
+		profiler.enable()
 	
 	# Load data
-	tree = Tree(args.freq, args.lang, debug=args.debug)
-	args.anki = load_anki(args) if args.anki else dict()
+	tree = Tree(args.freq, args.lang, debug=args.debug, shared=args.shared)
+	if args.daemon:
+		return daemon.Server(tree, args, run, load_extras).serve()
+	load_extras(args)
+	if args.profile_startup:
+		profiler.report(args.profile_startup, version=VERSION, lang=args.lang, freq=args.freq, argv=sys.argv[1:])
+	return run(args, tree)
+
+
+def load_extras(args):
+	"Replace the anki and book paths in args with their data"
+	with profiler.phase("anki"):
+		args.anki = load_anki(args) if args.anki else dict()
 	eprint("\n")
 
 
 	if args.book:
-		args.book = mybook.load_book(args.book)
+		with profiler.phase("book"):
+			args.book = mybook.load_book(args.book)
+
+
+def run(args, tree):
+	"Process the command line once the tree is loaded"
 	if args.rankbook:
 		return rank_book(args, tree)
+	if args.define:
+		import definitions
+		return definitions.show_search(tree, args.define, args.pos)
 
 
 	# Get word list
@@ -598,6 +655,7 @@ def main():
 			words = get_words(args.dupes, args.length, skiplines=args.skiplines, multiline=args.multiline)
 			eprint("Found", len(words), "words in input file:", args.dupes)					
 		eprint("No filename specified, but you can manually type in a word below if you wish:")
+		from manual import manual_input
 		return manual_input(tree, args, find_dupes(words, tree, args))
 
 
@@ -662,10 +720,6 @@ if __name__ == "__main__":
 		eprint("\n\nWindows users must run this program with: python3 -X utf8")
 		sys.exit(1)
 
-	if not os.access('.', os.W_OK):
-		print("Directory", os.getcwd(), "must be writable to store a cached version of the wikitionary database.")
-		sys.exit(1)
-
 	if '--testall' in sys.argv:
 		testall()
 	else: